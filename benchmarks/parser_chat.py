@@ -0,0 +1,70 @@
+"""Mede a leitura de um chat exportado grande (sintético) pelo parser do motor.
+
+Gera um .txt de vários anos com mensagens de texto e de mídia misturadas, no layout escolhido,
+e cronometra `horarios_de_midia` sobre o arquivo mapeado em memória. Para o layout Android 24h
+também roda a leitura antiga (linha a linha, com strptime por linha) e confere que as duas
+encontram os mesmos horários.
+
+Uso:
+    python benchmarks/parser_chat.py
+    python benchmarks/parser_chat.py --mb 500 --layout ios
+"""
+import argparse
+import datetime
+import os
+import re
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from motor_ponto import abrir_bytes, horarios_de_midia
+from sintetico import LAYOUTS, gerar_chat
+
+def leitura_antiga(caminho, d_ini, d_fim):
+    horarios = []
+    padrao = re.compile(r'^(\d{2}/\d{2}/\d{4})\s(\d{2}:\d{2})')
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if "<Mídia oculta>" in linha or "(arquivo anexado)" in linha or "(anexado)" in linha or ".jpg" in linha or ".opus" in linha:
+                m = padrao.search(linha)
+                if m:
+                    d, h = m.groups()
+                    try:
+                        dt = datetime.datetime.strptime(d, "%d/%m/%Y").date()
+                        if d_ini <= dt <= d_fim: horarios.append({'data': d, 'hora': h})
+                    except: pass
+    return horarios
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=200, help="Tamanho aproximado do chat gerado (MB)")
+    parser.add_argument("--anos", type=int, default=4, help="Quantos anos de conversa o chat cobre")
+    parser.add_argument("--dias", type=int, default=365, help="Tamanho do período consultado, terminando em 31/12/2023")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="android")
+    args = parser.parse_args(argv)
+
+    d_fim = datetime.date(2023, 12, 31); d_ini = d_fim - datetime.timedelta(days=args.dias)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "_chat.txt")
+        t = time.perf_counter(); gerar_chat(caminho, args.mb, args.layout, args.anos, com_nomes=True)
+        tamanho = os.path.getsize(caminho) / (1024 * 1024)
+        print(f"chat sintético: {tamanho:.0f} MB, layout {args.layout} (gerado em {time.perf_counter() - t:.1f}s)")
+
+        t = time.perf_counter()
+        with abrir_bytes(caminho) as buf: novos = horarios_de_midia(buf, d_ini, d_fim)
+        t_novo = time.perf_counter() - t
+        print(f"{'parser do motor':<20} {t_novo:7.2f}s  {tamanho / t_novo:7.0f} MB/s  {len(novos)} mídias no período")
+
+        if args.layout == "android":
+            t = time.perf_counter(); antigos = leitura_antiga(caminho, d_ini, d_fim); t_antigo = time.perf_counter() - t
+            print(f"{'leitura antiga':<20} {t_antigo:7.2f}s  {tamanho / t_antigo:7.0f} MB/s  {len(antigos)} mídias no período")
+            if antigos != [{'data': h['data'], 'hora': h['hora']} for h in novos]:
+                print("DIVERGÊNCIA entre a leitura antiga e o parser do motor"); return 1
+            print(f"resultados idênticos; {t_antigo / t_novo:.1f}x mais rápido")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
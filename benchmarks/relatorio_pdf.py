@@ -0,0 +1,135 @@
+"""Mede a geração do relatório executivo em PDF (MotorPonto.gerar_pdf) para uma equipe grande.
+
+Gera batidas sintéticas de N funcionários em D dias (padrão: 500 × 31), cronometra o renderizador
+do motor e mede o pico de memória Python (tracemalloc). Também roda o renderizador antigo
+(dicts por funcionário/dia, strptime por horário e um drawString por célula) para comparação.
+O ganho é de tempo; o pico de memória não cai (fica um pouco acima do antigo), porque o canvas
+do reportlab guarda todas as páginas até o save() e as colunas da agregação ocupam mais que os
+dicts do renderizador antigo.
+
+Uso:
+    python benchmarks/relatorio_pdf.py
+    python benchmarks/relatorio_pdf.py --funcionarios 2000 --dias 31 --sem-antigo
+"""
+import argparse
+import datetime
+import importlib.util
+import os
+import queue
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from motor_ponto import MotorPonto
+from sintetico import registros_mensais
+
+def gerar_pdf_antigo(filepath, data):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    c = canvas.Canvas(filepath, pagesize=A4)
+    w, h = A4
+    resumo_global = {}
+    meta_diaria = timedelta(hours=7, minutes=30)
+    for d in data:
+        resumo_global.setdefault(d['nome'], {'dias': {}, 'saldo': timedelta(0)})['dias'].setdefault(d['data'], []).append(d['hora'])
+    for nome, dados in resumo_global.items():
+        for dt, horas in dados['dias'].items():
+            horas.sort()
+            if len(horas) >= 2:
+                ent = datetime.datetime.strptime(horas[0], "%H:%M")
+                sai = datetime.datetime.strptime(horas[-1], "%H:%M")
+                if ent != sai: dados['saldo'] += (sai - ent) - timedelta(hours=1) - meta_diaria
+    y = h - 50
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(50, y, "Relatório Executivo de Ponto")
+    y -= 40
+    c.setFillColor(colors.black)
+    c.rect(50, y, 495, 25, fill=True, stroke=False)
+    c.setFillColor(colors.white)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(60, y + 8, "FUNCIONÁRIO")
+    c.drawString(400, y + 8, "SALDO TOTAL")
+    y -= 30
+    for nome in sorted(resumo_global):
+        saldo = resumo_global[nome]['saldo']
+        s = int(saldo.total_seconds()); sinal = "+" if s >= 0 else "-"; s = abs(s)
+        c.setFillColor(colors.black); c.setFont("Helvetica", 11); c.drawString(60, y, nome)
+        c.setFillColor(colors.green if saldo.total_seconds() >= 0 else colors.red); c.setFont("Helvetica-Bold", 11)
+        c.drawString(400, y, f"{sinal}{s // 3600:02d}:{(s % 3600) // 60:02d}")
+        c.setStrokeColor(colors.lightgrey); c.line(50, y - 5, 545, y - 5)
+        y -= 25
+    c.showPage()
+    y = h - 50
+    for nome in sorted(resumo_global):
+        if y < 150: c.showPage(); y = h - 50
+        c.setFillColor(colors.darkblue); c.setFont("Helvetica-Bold", 14); c.drawString(50, y, f"Extrato: {nome}")
+        y -= 25
+        c.setFillColor(colors.lightgrey); c.rect(50, y, 495, 15, fill=True, stroke=False)
+        c.setFillColor(colors.black); c.setFont("Helvetica-Bold", 9)
+        for x, rotulo in ((55, "DATA"), (130, "ENTRADA"), (200, "SAÍDA"), (270, "STATUS")): c.drawString(x, y + 4, rotulo)
+        y -= 20
+        dias = resumo_global[nome]['dias']
+        for dt in sorted(dias, key=lambda x: datetime.datetime.strptime(x, "%d/%m/%Y")):
+            horas = sorted(dias[dt])
+            ent, sai, status, cor_st = horas[0], horas[-1], "OK", colors.black
+            if ent == sai: status, cor_st, sai = "Ponto Incompleto", colors.orange, "--:--"
+            c.setFillColor(colors.black); c.setFont("Helvetica", 10)
+            c.drawString(55, y, dt); c.drawString(130, y, ent); c.drawString(200, y, sai)
+            c.setFillColor(cor_st); c.drawString(270, y, status)
+            y -= 15
+            if y < 50: c.showPage(); y = h - 50
+        y -= 30
+    c.save()
+
+def medir(f):
+    """(segundos, pico de memória em MB) de f()."""
+    tracemalloc.start()
+    t = time.perf_counter()
+    try: f()
+    finally:
+        dt = time.perf_counter() - t
+        _, pico = tracemalloc.get_traced_memory(); tracemalloc.stop()
+    return dt, pico / (1024 * 1024)
+
+def comparar(args, pasta, registros):
+    motor = MotorPonto("funcionarios", {}, queue.Queue())
+    try:
+        caminho = os.path.join(pasta, "relatorio.pdf")
+        t_novo, mem_novo = medir(lambda: motor.gerar_pdf(caminho, registros))
+        print(f"{'gerar_pdf':<20} {t_novo:7.2f}s  pico {mem_novo:7.1f} MB  {os.path.getsize(caminho) / 1024:8.0f} KB")
+        if not args.sem_antigo:
+            caminho = os.path.join(pasta, "relatorio_antigo.pdf")
+            t_antigo, mem_antigo = medir(lambda: gerar_pdf_antigo(caminho, registros))
+            print(f"{'renderizador antigo':<20} {t_antigo:7.2f}s  pico {mem_antigo:7.1f} MB  {os.path.getsize(caminho) / 1024:8.0f} KB")
+            tempo = f"{t_antigo / t_novo:.1f}x mais rápido" if t_novo <= t_antigo else f"{t_novo / t_antigo:.1f}x mais lento"
+            memoria = f"pico de memória {abs(mem_novo / mem_antigo - 1):.0%} {'menor' if mem_novo <= mem_antigo else 'maior'}"
+            print(f"gerar_pdf: {tempo}, {memoria} que o renderizador antigo")
+    finally:
+        motor.banco.fechar()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--funcionarios", type=int, default=500)
+    parser.add_argument("--dias", type=int, default=31)
+    parser.add_argument("--sem-antigo", action="store_true", help="Não roda o renderizador antigo")
+    args = parser.parse_args(argv)
+    if importlib.util.find_spec("reportlab") is None: print("reportlab não instalado: nada a medir."); return 1
+
+    registros = registros_mensais(args.funcionarios, args.dias)
+    print(f"{args.funcionarios} funcionários × {args.dias} dias: {len(registros)} batidas")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        # O motor abre o banco local na pasta atual
+        os.chdir(pasta)
+        try: comparar(args, pasta, registros)
+        finally: os.chdir(cwd)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
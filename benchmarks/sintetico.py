@@ -0,0 +1,124 @@
+"""Gerador de dados sintéticos para os benchmarks: chats exportados do WhatsApp em vários layouts,
+ZIPs com fotos/áudios, pasta de funcionários e batidas no banco local.
+
+Nada aqui depende do face_recognition: as fotos são JPEGs de ruído e os encodings são vetores aleatórios.
+"""
+import datetime
+import io
+import os
+import random
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+LAYOUTS = {
+    "android": lambda dt: dt.strftime("%d/%m/%Y %H:%M - "),
+    "android12h": lambda dt: f"{dt:%d/%m/%y}, {dt.hour % 12 or 12}:{dt:%M} {'PM' if dt.hour >= 12 else 'AM'} - ",
+    "ios": lambda dt: dt.strftime("[%d/%m/%y, %H:%M:%S] "),
+}
+TEXTOS = ["bom dia", "cheguei", "ok", "saindo para o almoço", "alguém viu a chave do depósito?"]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabi", "Hugo"]
+
+def anexo(layout, dt, seq, ext="jpg"):
+    """Nome do arquivo anexado e o texto da mensagem, como cada sistema exporta."""
+    if layout == "ios":
+        tipo = "PHOTO" if ext == "jpg" else "AUDIO"
+        nome = f"{seq:08d}-{tipo}-{dt:%Y-%m-%d-%H-%M-%S}.{ext}"
+        return nome, f"‎<anexado: {nome}>"
+    prefixo = "IMG" if ext == "jpg" else "PTT"
+    nome = f"{prefixo}-{dt:%Y%m%d}-WA{seq:04d}.{ext}"
+    return nome, f"{nome} (arquivo anexado)"
+
+def linhas_chat(layout, inicio, passo_medio, fracao_midia=0.3, semente=0, com_nomes=True):
+    """Gera (linha, nome_do_anexo_ou_None) sem fim, em ordem cronológica."""
+    rnd = random.Random(semente)
+    cabecalho = LAYOUTS[layout]
+    dt = inicio; seq = 0
+    while True:
+        dt += datetime.timedelta(seconds=rnd.uniform(0, 2 * passo_medio))
+        nome = rnd.choice(NOMES)
+        arquivo = None
+        if rnd.random() < fracao_midia:
+            seq += 1
+            if com_nomes:
+                arquivo, msg = anexo(layout, dt, seq, "jpg" if rnd.random() < 0.85 else "opus")
+            else: msg = "<Mídia oculta>"
+        else: msg = rnd.choice(TEXTOS)
+        yield f"{cabecalho(dt)}{nome}: {msg}\n", arquivo
+
+def gerar_chat(caminho, mb, layout="android", anos=4, semente=0, com_nomes=False):
+    """Escreve um chat de ~`mb` MB cobrindo `anos` anos até 31/12/2023."""
+    passo = (anos * 365 * 24 * 3600) / (mb * 1024 * 1024 / 60)  # ~60 bytes por linha
+    limite = mb * 1024 * 1024; escrito = 0
+    with open(caminho, "w", encoding="utf-8") as f:
+        for linha, _ in linhas_chat(layout, datetime.datetime(2024 - anos, 1, 1, 7, 0), passo, semente=semente, com_nomes=com_nomes):
+            f.write(linha); escrito += len(linha)
+            if escrito >= limite: break
+
+def jpeg_ruido(largura=640, altura=480, semente=0, qualidade=80):
+    rng = np.random.default_rng(semente)
+    base = rng.integers(0, 255, (altura // 16, largura // 16, 3), dtype=np.uint8)
+    b = io.BytesIO()
+    Image.fromarray(base).resize((largura, altura), Image.BILINEAR).save(b, "JPEG", quality=qualidade)
+    return b.getvalue()
+
+def gerar_zip(caminho, n_midias, layout="android", dias=31, largura=640, altura=480, semente=0):
+    """ZIP de export com `n_midias` anexos (85% fotos, 15% áudios) espalhados em `dias` dias até 31/12/2023,
+    mais as mensagens de texto entre eles. Fotos se repetem de um pequeno conjunto para o ZIP gerar rápido."""
+    fotos = [jpeg_ruido(largura, altura, semente + i) for i in range(16)]
+    audio = bytes(random.Random(semente).getrandbits(8) for _ in range(4096))
+    inicio = datetime.datetime(2023, 12, 31) - datetime.timedelta(days=dias)
+    passo = dias * 24 * 3600 / (n_midias / 0.3)
+    linhas = []; anexos = 0
+    with zipfile.ZipFile(caminho, "w", zipfile.ZIP_STORED) as z:
+        for linha, arquivo in linhas_chat(layout, inicio, passo, semente=semente):
+            linhas.append(linha)
+            if arquivo:
+                z.writestr(arquivo, fotos[anexos % len(fotos)] if arquivo.endswith(".jpg") else audio)
+                anexos += 1
+                if anexos >= n_midias: break
+        z.writestr("_chat.txt" if layout == "ios" else "Conversa do WhatsApp com Ponto.txt", "".join(linhas).encode("utf-8"), zipfile.ZIP_DEFLATED)
+    return inicio.date(), datetime.date(2023, 12, 31)
+
+def gerar_funcionarios(pasta, n, fotos_por_pessoa=3, semente=0):
+    """Pasta de referência com `n` funcionários. Retorna os caminhos criados."""
+    os.makedirs(pasta, exist_ok=True)
+    foto = jpeg_ruido(160, 160, semente)
+    caminhos = []
+    for i in range(n):
+        for j in range(fotos_por_pessoa):
+            p = os.path.join(pasta, f"func{i:05d}_{j}.jpg")
+            with open(p, "wb") as f: f.write(foto)
+            caminhos.append(p)
+    return caminhos
+
+def encodings_aleatorios(n, semente=0):
+    rng = np.random.default_rng(semente)
+    e = rng.normal(size=(n, 128))
+    return list(0.4 * e / np.linalg.norm(e, axis=1, keepdims=True))
+
+def batidas_aleatorias(n, n_funcionarios=200, dias=365, semente=0):
+    """Tuplas no formato de BancoPonto.registrar_batidas: ~2-4 batidas por funcionário por dia."""
+    rnd = random.Random(semente)
+    inicio = datetime.date(2023, 1, 1)
+    for i in range(n):
+        data = inicio + datetime.timedelta(days=rnd.randrange(dias))
+        hora = f"{rnd.randrange(6, 20):02d}:{rnd.randrange(60):02d}"
+        yield (f"Func{rnd.randrange(n_funcionarios):04d}", f"{data:%d/%m/%Y}", hora, f"IMG-{i}.jpg", f"h{i:08x}", None, 0)
+
+def registros_mensais(n_funcionarios, dias=31, semente=0):
+    """Batidas consolidadas (dicts nome/data/hora, como saem de MotorPonto.processar) de `n_funcionarios`
+    em `dias` dias a partir de 01/12/2023: entrada, almoço e saída, com ~5% dos dias só com a entrada."""
+    rnd = random.Random(semente)
+    inicio = datetime.date(2023, 12, 1)
+    registros = []
+    for f in range(n_funcionarios):
+        nome = f"Func{f:04d}"
+        for d in range(dias):
+            data = f"{inicio + datetime.timedelta(days=d):%d/%m/%Y}"
+            minutos = [rnd.randrange(7 * 60, 9 * 60)]
+            if rnd.random() >= 0.05:
+                minutos += [rnd.randrange(11 * 60 + 30, 13 * 60), rnd.randrange(13 * 60, 14 * 60), rnd.randrange(16 * 60, 19 * 60)]
+            registros += [{'nome': nome, 'data': data, 'hora': f"{m // 60:02d}:{m % 60:02d}"} for m in minutos]
+    return registros
@@ -0,0 +1,195 @@
+"""Suíte de benchmarks do pipeline de ponto sobre dados sintéticos, comparada com uma baseline gravada.
+
+Casos (cada um gera os próprios dados com benchmarks/sintetico.py, numa pasta temporária):
+    chat        leitura do .txt exportado, em cada layout (Android 24h, Android 12h, iOS)
+    zip         listagem do ZIP, leitura do chat, pareamento mídia/mensagem e hash de conteúdo
+    galeria     carga da galeria de funcionários com o cache de encodings já preenchido
+    comparacao  comparação de rostos contra galerias de 10, 100 e 1000 funcionários
+    relatorio   consulta ao banco, agregação de entrada/saída (gerar_relatorio) e banco de horas com 1k/100k/1M batidas
+    exportacao  CSV, Excel e PDF do relatório nos mesmos tamanhos
+
+Os tempos ficam em benchmarks/baseline.json; como dependem da máquina, regrave a baseline ao trocar de máquina.
+Casos cuja dependência não está instalada (openpyxl, reportlab) aparecem como indisponíveis e não contam.
+
+Uso:
+    python benchmarks/suite.py                     # roda tudo e compara com a baseline
+    python benchmarks/suite.py --rapido            # tamanhos menores (até 100k batidas)
+    python benchmarks/suite.py --casos chat,relatorio
+    python benchmarks/suite.py --salvar-baseline   # grava os tempos atuais como a nova baseline
+
+Sai com código 1 se algum caso ficar mais lento que a baseline além da tolerância.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import queue
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from motor_ponto import (BancoPonto, GaleriaRostos, MotorPonto, abrir_bytes, agregar_relatorio, exportar_relatorio_csv,
+                         exportar_relatorio_excel, fechar_zips, hash_midia, horarios_de_midia)
+from sintetico import (LAYOUTS, batidas_aleatorias, encodings_aleatorios, gerar_chat, gerar_funcionarios, gerar_zip)
+
+ARQUIVO_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+class Indisponivel(Exception):
+    """Dependência opcional ausente: o caso é pulado."""
+
+def cronometrar(f, repeticoes=1):
+    """Menor tempo de `repeticoes` execuções de f()."""
+    melhor = None
+    for _ in range(repeticoes):
+        t = time.perf_counter(); f(); dt = time.perf_counter() - t
+        melhor = dt if melhor is None else min(melhor, dt)
+    return melhor
+
+def caso_chat(tam):
+    d_fim = datetime.date(2023, 12, 31); d_ini = d_fim - datetime.timedelta(days=365)
+    for layout in sorted(LAYOUTS):
+        gerar_chat("chat.txt", tam['chat_mb'], layout, com_nomes=True)
+        def ler():
+            with abrir_bytes("chat.txt") as buf: horarios_de_midia(buf, d_ini, d_fim)
+        yield f"chat.{layout}.{tam['chat_mb']}mb", cronometrar(ler, 3)
+
+def caso_zip(tam):
+    n = tam['midias']
+    d_ini, d_fim = gerar_zip("export.zip", n)
+    motor = MotorPonto("funcionarios", {}, queue.Queue())
+    motor.caminho_zip = "export.zip"
+    def ingerir():
+        _, caminho_txt, arquivos = motor.preparing_arquivos()
+        pares = motor.parear_midias(motor.obter_horarios_validos(caminho_txt, d_ini, d_fim), arquivos)
+        for arq, _ in pares: hash_midia(arq)
+        fechar_zips()
+    yield f"zip.{n}midias", cronometrar(ingerir, 3)
+
+def caso_galeria(tam):
+    n = tam['funcionarios']
+    caminhos = gerar_funcionarios("funcionarios", n)
+    motor = MotorPonto("funcionarios", {}, queue.Queue())
+    for p, enc in zip(caminhos, encodings_aleatorios(len(caminhos))): motor.cache_encodings.registrar(p, enc)
+    motor.cache_encodings.salvar()
+    def carregar():
+        # Motor novo a cada vez: inclui ler o cache do banco, como na abertura do programa
+        MotorPonto("funcionarios", {}, queue.Queue()).carregar_galeria()
+    yield f"galeria.{n}func", cronometrar(carregar, 3)
+
+def caso_comparacao(tam):
+    consultas = encodings_aleatorios(1000, semente=1)
+    for n in (10, 100, 1000):
+        encs = encodings_aleatorios(3 * n)
+        galeria = GaleriaRostos(encs, [f"Func{i // 3}" for i in range(3 * n)])
+        yield f"comparacao.{n}func.1000fotos", cronometrar(lambda: [galeria.comparar([e], 0.45) for e in consultas], 3)
+
+def _banco_com_batidas(n):
+    banco = BancoPonto(f"batidas_{n}.db")
+    if not banco.tem_batidas(): banco.registrar_batidas(batidas_aleatorias(n, n_funcionarios=max(10, n // 500)))
+    return banco
+
+def caso_relatorio(tam):
+    for n in tam['batidas']:
+        banco = _banco_com_batidas(n)
+        d_ini, d_fim = datetime.date(2023, 1, 1), datetime.date(2023, 12, 31)
+        yield f"relatorio.consulta.{n}", cronometrar(lambda: banco.consultar_batidas(d_ini, d_fim))
+        batidas = banco.consultar_batidas(d_ini, d_fim)
+        yield f"relatorio.agregacao.{n}", cronometrar(lambda: agregar_relatorio(batidas))
+        # Caminho colunar da aba de relatórios: consulta direto em arrays, sem um dict por batida
+        yield f"relatorio.colunas.{n}", cronometrar(lambda: banco.consultar_colunas(d_ini, d_fim).linhas_relatorio())
+        colunas = banco.consultar_colunas(d_ini, d_fim)
+        yield f"relatorio.saldos.{n}", cronometrar(lambda: colunas.saldos(), 3)
+
+def caso_exportacao(tam):
+    for n in tam['batidas']:
+        banco = _banco_com_batidas(n)
+        batidas = banco.consultar_batidas(datetime.date(2023, 1, 1), datetime.date(2023, 12, 31))
+        linhas = agregar_relatorio(batidas)
+        yield f"exportacao.csv.{n}", cronometrar(lambda: exportar_relatorio_csv("relatorio.csv", linhas))
+        def excel():
+            try: exportar_relatorio_excel("relatorio.xlsx", linhas)
+            except ImportError: raise Indisponivel("openpyxl")
+        yield f"exportacao.excel.{n}", excel
+        def pdf():
+            try: MotorPonto("funcionarios", {}, queue.Queue()).gerar_pdf("relatorio.pdf", batidas)
+            except ImportError: raise Indisponivel("reportlab")
+        yield f"exportacao.pdf.{n}", pdf
+
+CASOS = {'chat': caso_chat, 'zip': caso_zip, 'galeria': caso_galeria, 'comparacao': caso_comparacao,
+         'relatorio': caso_relatorio, 'exportacao': caso_exportacao}
+
+TAMANHOS = {
+    'completo': {'chat_mb': 50, 'midias': 2000, 'funcionarios': 300, 'batidas': (1000, 100000, 1000000)},
+    'rapido': {'chat_mb': 10, 'midias': 500, 'funcionarios': 100, 'batidas': (1000, 100000)},
+}
+
+def rodar(casos, tam):
+    """Roda os casos numa pasta temporária. Retorna {medida: segundos ou None se indisponível}."""
+    resultados = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        try:
+            for nome in casos:
+                for medida, valor in CASOS[nome](tam):
+                    # Medidas lentas podem vir como função, cronometrada aqui, para que a falta de dependência só pule a medida
+                    if callable(valor):
+                        try: valor = cronometrar(valor)
+                        except Indisponivel as e: print(f"{medida:<40} indisponível ({e})"); resultados[medida] = None; continue
+                    resultados[medida] = valor
+                    print(f"{medida:<40} {valor:9.4f}s", flush=True)
+        finally:
+            fechar_zips(); os.chdir(cwd)
+    return resultados
+
+def comparar(resultados, baseline, tolerancia):
+    """Imprime a comparação com a baseline. Retorna as medidas que ficaram mais lentas."""
+    piores = []
+    print(f"\n{'medida':<40} {'baseline':>10} {'atual':>10} {'razão':>7}")
+    for medida, atual in resultados.items():
+        base = baseline.get(medida)
+        if atual is None or base is None: continue
+        razao = atual / base if base else float('inf')
+        # Abaixo de alguns milissegundos o ruído domina: só conta se a diferença absoluta também for relevante
+        lento = razao > 1 + tolerancia and atual - base > 0.005
+        if lento: piores.append(medida)
+        print(f"{medida:<40} {base:9.4f}s {atual:9.4f}s {razao:6.2f}x{'  MAIS LENTO' if lento else ''}")
+    return piores
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--casos", default=",".join(CASOS), help=f"Casos a rodar, separados por vírgula ({', '.join(CASOS)})")
+    parser.add_argument("--rapido", action="store_true", help="Tamanhos menores (sem o caso de 1M batidas)")
+    parser.add_argument("--baseline", default=ARQUIVO_BASELINE, help="Arquivo de baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Quanto mais lento que a baseline ainda passa (0.25 = 25%%)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava os tempos desta execução como baseline")
+    args = parser.parse_args(argv)
+
+    casos = [c.strip() for c in args.casos.split(",") if c.strip()]
+    desconhecidos = [c for c in casos if c not in CASOS]
+    if desconhecidos: parser.error(f"casos desconhecidos: {', '.join(desconhecidos)}")
+    resultados = rodar(casos, TAMANHOS['rapido' if args.rapido else 'completo'])
+
+    anterior = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f: anterior = json.load(f)
+    if args.salvar_baseline:
+        # Medidas não rodadas agora continuam com o valor anterior
+        medidas = dict(anterior.get('resultados', {}))
+        medidas.update({k: v for k, v in resultados.items() if v is not None})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({'gravada_em': datetime.datetime.now().isoformat(timespec='seconds'), 'maquina': platform.platform(),
+                       'python': platform.python_version(), 'resultados': medidas}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\nBaseline gravada em {args.baseline}")
+        return 0
+    if not anterior: print("\nSem baseline para comparar (rode com --salvar-baseline)."); return 0
+    piores = comparar(resultados, anterior.get('resultados', {}), args.tolerancia)
+    if piores: print(f"\n{len(piores)} medidas mais lentas que a baseline."); return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Mede o tempo de importação dos módulos do sistema e confere contra um orçamento.
+
+Cada módulo é importado num processo Python novo (cache frio de módulos). Além do tempo,
+verifica se alguma dependência pesada (dlib/face_recognition, gspread, reportlab, openpyxl,
+cairosvg) foi carregada na importação — elas devem ser importadas só no primeiro uso.
+
+Uso:
+    python benchmarks/tempo_importacao.py
+    python benchmarks/tempo_importacao.py --orcamento-motor 0.3 --orcamento-interface 1.5
+
+Sai com código 1 se algum módulo estourar o orçamento ou carregar dependência pesada.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PESADOS = ["face_recognition", "dlib", "gspread", "oauth2client", "reportlab", "openpyxl", "cairosvg"]
+
+SNIPPET = """
+import json, sys, time
+t = time.perf_counter()
+import {modulo}
+tempo = time.perf_counter() - t
+print(json.dumps({{"tempo": tempo, "pesados": [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+def medir(modulo):
+    proc = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(modulo=modulo, pesados=PESADOS)],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "erro desconhecido"
+    return json.loads(proc.stdout.strip().splitlines()[-1]), None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orcamento-motor", type=float, default=0.5, help="Segundos permitidos para 'import motor_ponto'")
+    parser.add_argument("--orcamento-interface", type=float, default=2.0, help="Segundos permitidos para 'import sistema_ponto_visual'")
+    args = parser.parse_args(argv)
+
+    falhou = False
+    for modulo, orcamento in (("motor_ponto", args.orcamento_motor), ("sistema_ponto_visual", args.orcamento_interface)):
+        resultado, erro = medir(modulo)
+        if erro:
+            print(f"{modulo:<22} não importou: {erro}")
+            falhou = True
+            continue
+        estado = "OK" if resultado["tempo"] <= orcamento else "ACIMA DO ORÇAMENTO"
+        print(f"{modulo:<22} {resultado['tempo']:.3f}s (orçamento {orcamento:.2f}s) {estado}")
+        if resultado["pesados"]:
+            print(f"{'':<22} carregou na importação: {', '.join(resultado['pesados'])}")
+            falhou = True
+        if resultado["tempo"] > orcamento: falhou = True
+    return 1 if falhou else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
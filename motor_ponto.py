@@ -0,0 +1,1572 @@
+"""Motor do Sistema Ponto Neural: leitura do ZIP do WhatsApp, reconhecimento facial,
+envio para o Google Sheets e relatório PDF. Não depende de customtkinter/tkinterdnd2,
+então pode rodar em servidor (ver `python motor_ponto.py --help`).
+
+face_recognition (modelos do dlib), gspread/oauth2client e reportlab são importados só no
+primeiro uso, para que a interface abra sem pagar esse custo."""
+import os
+import datetime
+import time
+import re
+import io
+import threading
+import queue
+import traceback
+import logging
+import zipfile
+import zlib
+import mmap
+import contextlib
+import posixpath
+import shutil
+import tempfile
+import numpy as np
+import json
+import sqlite3
+import sys
+import csv
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+def log_debug(msg):
+    print(msg)
+    logging.info(msg)
+
+NOME_PLANILHA_GOOGLE = "PontoFuncionarios"
+ARQUIVO_BANCO = "ponto.db"
+ARQUIVO_OUTBOX_SHEETS = "outbox_sheets.json"
+ARQUIVO_SINCRONIZADOS = "sheets_sincronizados.txt"
+
+# --- CACHE DE ENCODINGS DA GALERIA ---
+def codificar_referencia(path):
+    """Gera o encoding de uma foto de referência (com fallback de upsample). Retorna None se não achar rosto."""
+    import face_recognition
+    im = face_recognition.load_image_file(path)
+    enc = face_recognition.face_encodings(im)
+    if not enc:
+        locs = face_recognition.face_locations(im, number_of_times_to_upsample=2, model="hog")
+        enc = face_recognition.face_encodings(im, known_face_locations=locs)
+    return enc[0] if enc else None
+
+class CacheEncodings:
+    """Cache persistente dos encodings da pasta 'funcionarios', chaveado por caminho + tamanho + mtime.
+    Fica em memória e é gravado na tabela `encodings` do BancoPonto (sem banco, vale só para a execução)."""
+    def __init__(self, banco=None):
+        self.banco = banco
+        self.lock = threading.Lock()
+        self.entradas = {}
+        self.sujos = set()
+        self.removidos = set()
+        if banco is not None: self.entradas = banco.carregar_encodings()
+
+    def salvar(self):
+        with self.lock:
+            if self.banco is None or not (self.sujos or self.removidos): return
+            gravar = {k: self.entradas[k] for k in self.sujos if k in self.entradas}
+            remover = set(self.removidos)
+            self.sujos.clear(); self.removidos.clear()
+        try: self.banco.salvar_encodings(gravar, remover)
+        except sqlite3.Error as e: log_debug(f"Erro ao salvar cache de encodings: {e}")
+
+    @staticmethod
+    def _chave(path):
+        return os.path.normpath(path)
+
+    def obter(self, path):
+        """Retorna (achou, encoding). encoding None = foto já analisada sem rosto."""
+        try: st = os.stat(path)
+        except OSError: return False, None
+        with self.lock:
+            ent = self.entradas.get(self._chave(path))
+        if not ent or ent['tamanho'] != st.st_size or ent['mtime'] != st.st_mtime: return False, None
+        return True, ent['encoding']
+
+    def registrar(self, path, encoding):
+        try: st = os.stat(path)
+        except OSError: return
+        chave = self._chave(path)
+        with self.lock:
+            self.entradas[chave] = {
+                'tamanho': st.st_size,
+                'mtime': st.st_mtime,
+                'encoding': np.asarray(encoding, dtype=np.float64) if encoding is not None else None
+            }
+            self.sujos.add(chave); self.removidos.discard(chave)
+
+    def invalidar(self, path):
+        chave = self._chave(path)
+        with self.lock:
+            if self.entradas.pop(chave, None) is not None: self.removidos.add(chave); self.sujos.discard(chave)
+
+    def podar(self, paths_existentes):
+        """Remove do cache as fotos que não existem mais na galeria."""
+        validos = {self._chave(p) for p in paths_existentes}
+        with self.lock:
+            for k in [k for k in self.entradas if k not in validos]:
+                del self.entradas[k]; self.removidos.add(k); self.sujos.discard(k)
+
+# --- BANCO DE DADOS (SQLite) ---
+CAMPOS_FUNCIONARIO = ("id", "nome", "salario", "admissao", "email", "celular", "cpf", "carteira_trabalho", "status")
+
+class BancoPonto:
+    """Banco SQLite embutido com funcionários, fotos, encodings e batidas de ponto.
+
+    Uma única conexão compartilhada entre as threads (protegida por lock); toda escrita é feita
+    numa transação. As datas das batidas ficam em ISO (aaaa-mm-dd) para permitir consulta por período.
+    """
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT);
+        CREATE TABLE IF NOT EXISTS funcionarios (
+            id INTEGER PRIMARY KEY, nome TEXT NOT NULL, salario TEXT, admissao TEXT, email TEXT,
+            celular TEXT, cpf TEXT, carteira_trabalho TEXT, status TEXT NOT NULL DEFAULT 'ativo'
+        );
+        CREATE TABLE IF NOT EXISTS fotos (
+            funcionario_id INTEGER NOT NULL REFERENCES funcionarios(id) ON DELETE CASCADE,
+            arquivo TEXT NOT NULL, ordem INTEGER NOT NULL, PRIMARY KEY (funcionario_id, arquivo)
+        );
+        CREATE TABLE IF NOT EXISTS encodings (caminho TEXT PRIMARY KEY, tamanho INTEGER, mtime REAL, encoding BLOB);
+        CREATE TABLE IF NOT EXISTS batidas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, data TEXT NOT NULL, hora TEXT NOT NULL,
+            arquivo TEXT, hash_arquivo TEXT, distancia REAL, rosto INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (arquivo, data, hora, rosto)
+        );
+        CREATE INDEX IF NOT EXISTS idx_batidas_nome_data ON batidas (nome, data);
+        CREATE INDEX IF NOT EXISTS idx_batidas_data ON batidas (data);
+        CREATE TABLE IF NOT EXISTS midias_processadas (
+            hash_arquivo TEXT PRIMARY KEY, arquivo TEXT, data TEXT, hora TEXT,
+            encodings BLOB, nomes TEXT NOT NULL, manual INTEGER NOT NULL DEFAULT 0, atualizado REAL
+        );
+    """
+
+    def __init__(self, caminho=ARQUIVO_BANCO):
+        self.caminho = caminho
+        self.lock = threading.RLock()
+        self.con = sqlite3.connect(caminho, check_same_thread=False)
+        self.con.row_factory = sqlite3.Row
+        with self.lock:
+            self.con.execute("PRAGMA journal_mode=WAL")
+            self.con.execute("PRAGMA foreign_keys=ON")
+            self.con.executescript(self.ESQUEMA)
+            self._migrar_batidas()
+
+    def _migrar_batidas(self):
+        """Bancos antigos tinham outra chave única nas batidas: (nome, data, hora, hash) deixava a mesma foto com dois
+        nomes quando o rótulo mudava, e (hash, rosto) juntava numa batida só os reenvios idênticos em horários
+        diferentes. Agora cada rosto de cada mensagem é uma batida: única por (arquivo, data, hora, rosto)."""
+        sql = self.con.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'batidas'").fetchone()['sql']
+        if "UNIQUE (arquivo, data, hora, rosto)" not in sql:
+            with self.con:
+                self.con.execute("ALTER TABLE batidas RENAME TO batidas_v1")
+                self.con.execute("DROP INDEX IF EXISTS idx_batidas_nome_data")
+                self.con.execute("DROP INDEX IF EXISTS idx_batidas_data")
+            self.con.executescript(self.ESQUEMA)
+        # Também retoma uma migração interrompida depois da renomeação
+        if not self.con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'batidas_v1'").fetchone(): return
+        tem_rosto = 'rosto' in [r['name'] for r in self.con.execute("PRAGMA table_info(batidas_v1)")]
+        rotulos = {r['hash_arquivo']: json.loads(r['nomes']) for r in self.con.execute("SELECT hash_arquivo, nomes FROM midias_processadas")}
+        por_mensagem = {}
+        for r in self.con.execute("SELECT * FROM batidas_v1 ORDER BY id"):
+            por_mensagem.setdefault((r['arquivo'], r['data'], r['hora']), []).append(r)
+        linhas = []
+        for rows in por_mensagem.values():
+            r = rows[0]; nomes = rotulos.get(r['hash_arquivo'])
+            if tem_rosto: linhas += [(x['nome'], x['data'], x['hora'], x['arquivo'], x['hash_arquivo'], x['distancia'], x['rosto']) for x in rows]
+            elif nomes:
+                # O rótulo atual de cada rosto está no registro de mídias; os rótulos antigos da foto são descartados
+                distancias = {x['nome']: x['distancia'] for x in rows}
+                linhas += [(n, r['data'], r['hora'], r['arquivo'], r['hash_arquivo'], distancias.get(n), k) for k, n in enumerate(nomes)]
+            else: linhas += [(x['nome'], x['data'], x['hora'], x['arquivo'], x['hash_arquivo'], x['distancia'], k) for k, x in enumerate(rows)]
+        with self.con:
+            self.con.executemany("INSERT OR IGNORE INTO batidas (nome, data, hora, arquivo, hash_arquivo, distancia, rosto) VALUES (?, ?, ?, ?, ?, ?, ?)", linhas)
+            self.con.execute("DROP TABLE batidas_v1")
+
+    def fechar(self):
+        with self.lock: self.con.close()
+
+    # Meta
+    def obter_meta(self, chave):
+        with self.lock:
+            row = self.con.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return row['valor'] if row else None
+
+    def definir_meta(self, chave, valor):
+        with self.lock, self.con:
+            self.con.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)", (chave, valor))
+
+    # Funcionários
+    def carregar_funcionarios(self):
+        """Retorna a lista de funcionários no mesmo formato do antigo funcionarios.json."""
+        with self.lock:
+            funcs = [dict(r) for r in self.con.execute("SELECT * FROM funcionarios ORDER BY rowid")]
+            fotos = self.con.execute("SELECT funcionario_id, arquivo FROM fotos ORDER BY funcionario_id, ordem").fetchall()
+        por_id = {f['id']: f for f in funcs}
+        for f in funcs: f['fotos'] = []
+        for r in fotos:
+            if r['funcionario_id'] in por_id: por_id[r['funcionario_id']]['fotos'].append(r['arquivo'])
+        return funcs
+
+    SQL_UPSERT_FUNCIONARIO = (
+        f"INSERT INTO funcionarios ({', '.join(CAMPOS_FUNCIONARIO)}) VALUES ({', '.join('?' * len(CAMPOS_FUNCIONARIO))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{c}=excluded.{c}' for c in CAMPOS_FUNCIONARIO[1:])}"
+    )
+
+    @staticmethod
+    def _linha_funcionario(f):
+        return tuple(f.get(c, 'ativo' if c == 'status' else '') for c in CAMPOS_FUNCIONARIO)
+
+    def salvar_funcionario(self, f):
+        """Grava um funcionário só (cadastro, edição, desativação ou foto nova/removida): upsert da linha
+        e troca apenas das fotos dele."""
+        with self.lock, self.con:
+            self.con.execute(self.SQL_UPSERT_FUNCIONARIO, self._linha_funcionario(f))
+            self.con.execute("DELETE FROM fotos WHERE funcionario_id = ?", (f['id'],))
+            self.con.executemany(
+                "INSERT OR IGNORE INTO fotos (funcionario_id, arquivo, ordem) VALUES (?, ?, ?)",
+                [(f['id'], arq, n) for n, arq in enumerate(f.get('fotos', []))]
+            )
+
+    def salvar_funcionarios(self, funcionarios):
+        """Grava a lista inteira numa única transação (upsert; funcionários fora da lista são removidos). Usado na migração."""
+        with self.lock, self.con:
+            self.con.executemany(self.SQL_UPSERT_FUNCIONARIO, [self._linha_funcionario(f) for f in funcionarios])
+            ids = [f['id'] for f in funcionarios]
+            self.con.execute("CREATE TEMP TABLE IF NOT EXISTS _ids (id INTEGER PRIMARY KEY)")
+            self.con.execute("DELETE FROM _ids")
+            self.con.executemany("INSERT OR IGNORE INTO _ids VALUES (?)", [(i,) for i in ids])
+            self.con.execute("DELETE FROM funcionarios WHERE id NOT IN (SELECT id FROM _ids)")
+            self.con.execute("DELETE FROM fotos")
+            self.con.executemany(
+                "INSERT OR IGNORE INTO fotos (funcionario_id, arquivo, ordem) VALUES (?, ?, ?)",
+                [(f['id'], arq, n) for f in funcionarios for n, arq in enumerate(f.get('fotos', []))]
+            )
+
+    # Encodings
+    def carregar_encodings(self):
+        with self.lock:
+            rows = self.con.execute("SELECT caminho, tamanho, mtime, encoding FROM encodings").fetchall()
+        return {r['caminho']: {
+            'tamanho': r['tamanho'],
+            'mtime': r['mtime'],
+            'encoding': np.frombuffer(r['encoding'], dtype=np.float64).copy() if r['encoding'] is not None else None
+        } for r in rows}
+
+    def salvar_encodings(self, gravar, remover):
+        with self.lock, self.con:
+            self.con.executemany("DELETE FROM encodings WHERE caminho = ?", [(k,) for k in remover])
+            self.con.executemany(
+                "INSERT OR REPLACE INTO encodings (caminho, tamanho, mtime, encoding) VALUES (?, ?, ?, ?)",
+                [(k, e['tamanho'], e['mtime'], e['encoding'].tobytes() if e['encoding'] is not None else None) for k, e in gravar.items()]
+            )
+
+    # Batidas
+    def registrar_batidas(self, batidas):
+        """batidas: tuplas (nome, data dd/mm/aaaa, hora, arquivo, hash_arquivo, distancia, rosto).
+        Cada rosto de cada mensagem (arquivo, data, hora, rosto) é uma batida só: gravar de novo atualiza o nome, a
+        distância e o hash; reenvios da mesma foto em outro horário são batidas distintas. Retorna quantas são novas."""
+        linhas = []
+        for nome, data, hora, arquivo, hash_arquivo, distancia, rosto in batidas:
+            dia, mes, ano = data.split('/')
+            linhas.append((nome, f"{ano}-{mes}-{dia}", hora, arquivo, hash_arquivo, distancia, rosto))
+        with self.lock, self.con:
+            antes = self.con.execute("SELECT COUNT(*) FROM batidas").fetchone()[0]
+            self.con.executemany(
+                "INSERT INTO batidas (nome, data, hora, arquivo, hash_arquivo, distancia, rosto) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (arquivo, data, hora, rosto) DO UPDATE SET nome = excluded.nome, distancia = excluded.distancia, hash_arquivo = excluded.hash_arquivo", linhas
+            )
+            return self.con.execute("SELECT COUNT(*) FROM batidas").fetchone()[0] - antes
+
+    # Mídias já processadas (reaproveitadas nas próximas execuções)
+    def obter_midias(self, hashes):
+        """hash -> {'encodings': array (rostos x 128), 'nomes': [...], 'manual': bool} das mídias já vistas."""
+        hashes = list(hashes); resultado = {}
+        with self.lock:
+            for i in range(0, len(hashes), 500):
+                lote = hashes[i:i + 500]
+                for r in self.con.execute(f"SELECT hash_arquivo, encodings, nomes, manual FROM midias_processadas WHERE hash_arquivo IN ({', '.join('?' * len(lote))})", lote):
+                    resultado[r['hash_arquivo']] = {
+                        'encodings': np.frombuffer(r['encodings'] or b'', dtype=np.float64).reshape(-1, 128),
+                        'nomes': json.loads(r['nomes']),
+                        'manual': bool(r['manual'])
+                    }
+        return resultado
+
+    def registrar_midias(self, registros):
+        """registros: tuplas (hash, arquivo, data, hora, encodings, nomes) de fotos recém-analisadas."""
+        agora = time.time()
+        with self.lock, self.con:
+            self.con.executemany(
+                "INSERT OR REPLACE INTO midias_processadas (hash_arquivo, arquivo, data, hora, encodings, nomes, manual, atualizado) VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                [(h, arq, data, hora, np.asarray(encs, dtype=np.float64).reshape(-1, 128).tobytes(), json.dumps(nomes), agora)
+                 for h, arq, data, hora, encs, nomes in registros]
+            )
+
+    def atualizar_rotulos(self, rotulos):
+        """rotulos: hash -> (nomes finais, manual). Uma correção manual nunca é desfeita por um rótulo automático."""
+        agora = time.time()
+        with self.lock, self.con:
+            self.con.executemany(
+                "UPDATE midias_processadas SET nomes = ?, manual = MAX(manual, ?), atualizado = ? WHERE hash_arquivo = ? AND (manual = 0 OR ? = 1)",
+                [(json.dumps(nomes), int(manual), agora, h, int(manual)) for h, (nomes, manual) in rotulos.items()]
+            )
+
+    def tem_batidas(self):
+        with self.lock: return self.con.execute("SELECT 1 FROM batidas LIMIT 1").fetchone() is not None
+
+    def consultar_batidas(self, data_inicio, data_fim, nomes=None):
+        """Batidas do período (datas `datetime.date`), opcionalmente só dos nomes dados, no formato de dados_consolidados."""
+        sql = "SELECT nome, data, hora, arquivo FROM batidas WHERE data BETWEEN ? AND ?"
+        params = [data_inicio.isoformat(), data_fim.isoformat()]
+        if nomes:
+            sql += f" AND nome IN ({', '.join('?' * len(nomes))})"
+            params += list(nomes)
+        with self.lock:
+            rows = self.con.execute(sql + " ORDER BY data, nome, hora", params).fetchall()
+        return [{
+            'nome': r['nome'],
+            'data': f"{r['data'][8:10]}/{r['data'][5:7]}/{r['data'][0:4]}",
+            'hora': r['hora'],
+            'arquivo_origem': r['arquivo']
+        } for r in rows]
+
+    def consultar_colunas(self, data_inicio, data_fim, nomes=None, cancelar=None):
+        """Mesma consulta de consultar_batidas, mas já em BatidasColunares (sem montar um dict por batida).
+        `cancelar` (threading.Event) interrompe a consulta no meio; nesse caso retorna None."""
+        sql = "SELECT nome, data, hora FROM batidas WHERE data BETWEEN ? AND ?"
+        params = [data_inicio.isoformat(), data_fim.isoformat()]
+        if nomes:
+            sql += f" AND nome IN ({', '.join('?' * len(nomes))})"
+            params += list(nomes)
+        with self.lock:
+            # O SQLite chama o handler a cada N instruções da VM; retornar True aborta a consulta
+            if cancelar is not None: self.con.set_progress_handler(cancelar.is_set, 10000)
+            try:
+                cur = self.con.cursor(); cur.row_factory = None
+                rows = cur.execute(sql, params).fetchall()
+            except sqlite3.OperationalError:
+                if cancelar is not None and cancelar.is_set(): return None
+                raise
+            finally:
+                if cancelar is not None: self.con.set_progress_handler(None, 0)
+        if cancelar is not None and cancelar.is_set(): return None
+        if not rows: return BatidasColunares([], [], [], [])
+        nomes_col, datas, horas = zip(*rows)
+        return BatidasColunares.de_colunas(nomes_col, datas, horas, iso=True)
+
+# --- MOTOR DE COMPARAÇÃO VETORIZADO ---
+class GaleriaRostos:
+    """Galeria empilhada numa matriz float32 contígua; compara vários rostos numa única chamada NumPy."""
+    def __init__(self, encodings, nomes):
+        self.vazia = len(encodings) == 0
+        if self.vazia: return
+        self.nomes_unicos, codigos = np.unique(np.asarray(nomes), return_inverse=True)
+        ordem = np.argsort(codigos, kind='stable')
+        self.matriz = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32)[ordem])
+        self.normas2 = np.einsum('ij,ij->i', self.matriz, self.matriz)
+        codigos = codigos[ordem]
+        # Início de cada bloco de fotos da mesma pessoa (para o mínimo por identidade)
+        self.inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+
+    def distancias(self, encs):
+        """Matriz (rostos x identidades) com a menor distância euclidiana de cada rosto a cada pessoa."""
+        q = np.ascontiguousarray(np.atleast_2d(np.asarray(encs, dtype=np.float32)))
+        d2 = np.einsum('ij,ij->i', q, q)[:, None] + self.normas2[None, :] - 2.0 * (q @ self.matriz.T)
+        d = np.sqrt(np.maximum(d2, 0.0))
+        return np.minimum.reduceat(d, self.inicios, axis=1)
+
+    def comparar(self, encs, tolerancia):
+        """Retorna [(nome, distancia, margem)] por rosto; margem = distância do 2º colocado - distância do 1º."""
+        if len(encs) == 0: return []
+        if self.vazia: return [("Desconhecido", float('inf'), 0.0) for _ in encs]
+        d = self.distancias(encs)
+        melhor = d.argmin(axis=1)
+        dist = d[np.arange(len(d)), melhor]
+        if d.shape[1] > 1: segunda = np.partition(d, 1, axis=1)[:, 1]
+        else: segunda = np.full(len(d), np.inf, dtype=d.dtype)
+        resultado = []
+        for i in range(len(d)):
+            nome = str(self.nomes_unicos[melhor[i]]) if dist[i] <= tolerancia else "Desconhecido"
+            resultado.append((nome, float(dist[i]), float(segunda[i] - dist[i])))
+        return resultado
+
+# --- AQUECIMENTO DOS MODELOS ---
+_modelos_prontos = threading.Event()
+
+def aquecer_modelos():
+    """Carrega os modelos do dlib (detector HOG, landmarks e encoder) e roda uma detecção vazia.
+    Chamado em segundo plano pela interface para que o primeiro "Iniciar" não pague esse custo."""
+    if _modelos_prontos.is_set(): return
+    try:
+        inicio = time.perf_counter()
+        import face_recognition
+        face_recognition.face_locations(np.zeros((64, 64, 3), dtype=np.uint8))
+        log_debug(f"Modelos de reconhecimento carregados em {time.perf_counter() - inicio:.1f}s.")
+    except Exception as e: log_debug(f"Erro ao carregar modelos: {e}")
+    finally: _modelos_prontos.set()
+
+# --- LEITURA DIRETA DO ZIP (sem extractall) ---
+_zips_abertos = {}
+_lock_zips = threading.Lock()
+
+def _zip_aberto(caminho_zip):
+    # Um ZipFile por processo e por arquivo: o diretório central é lido uma única vez
+    with _lock_zips:
+        z = _zips_abertos.get(caminho_zip)
+        if z is None: z = _zips_abertos[caminho_zip] = zipfile.ZipFile(caminho_zip, 'r')
+        return z
+
+def fechar_zips():
+    with _lock_zips:
+        for z in _zips_abertos.values():
+            try: z.close()
+            except: pass
+        _zips_abertos.clear()
+
+class MidiaZip:
+    """Referência a um membro do ZIP exportado do WhatsApp, lido sob demanda."""
+    __slots__ = ('caminho_zip', 'nome')
+
+    def __init__(self, caminho_zip, nome):
+        self.caminho_zip = caminho_zip
+        self.nome = nome
+
+    def abrir(self):
+        return _zip_aberto(self.caminho_zip).open(self.nome)
+
+    def __repr__(self):
+        return f"{self.caminho_zip}::{self.nome}"
+
+def abrir_midia(ref):
+    """Abre uma mídia (caminho em disco ou MidiaZip) como arquivo binário com seek."""
+    if isinstance(ref, MidiaZip):
+        with ref.abrir() as f: return io.BytesIO(f.read())
+    return open(ref, 'rb')
+
+@contextlib.contextmanager
+def abrir_bytes(ref):
+    """Conteúdo bruto de um arquivo como buffer: mmap para arquivos em disco (não copia para a memória),
+    bytes para membros do ZIP (vêm comprimidos, não dá para mapear)."""
+    if isinstance(ref, MidiaZip):
+        with ref.abrir() as f: yield f.read()
+        return
+    with open(ref, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: yield b''; return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m: yield m
+
+def nome_midia(ref):
+    return posixpath.basename(ref.nome) if isinstance(ref, MidiaZip) else os.path.basename(ref)
+
+def hash_midia(ref):
+    """Identidade do conteúdo da mídia (CRC32 + tamanho). Para membros do ZIP vem de graça do diretório central."""
+    if isinstance(ref, MidiaZip):
+        info = _zip_aberto(ref.caminho_zip).getinfo(ref.nome)
+        return f"{info.CRC:08x}-{info.file_size}"
+    crc = 0
+    with open(ref, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''): crc = zlib.crc32(bloco, crc)
+    return f"{crc:08x}-{os.path.getsize(ref)}"
+
+# --- LEITURA DO CHAT EXPORTADO ---
+# Layouts de exportação suportados (a data pode vir com ano de 2 ou 4 dígitos, a hora com ou sem segundos,
+# em 24h ou 12h com AM/PM, às vezes separada por espaço estreito U+202F):
+#   Android: "25/03/2024 08:01 - Nome: <Mídia oculta>"      "25/03/24, 8:01 AM - Nome: IMG-...jpg (arquivo anexado)"
+#   iOS:     "[25/03/24, 08:01:22] Nome: <anexado: ...jpg>"  "[25/03/2024 8:01:22 PM] Nome: ..."
+# O texto é varrido como bytes: primeiro acham-se os marcadores de mídia (busca em C sobre o buffer inteiro),
+# depois só a linha de cada ocorrência passa pelo regex de cabeçalho.
+MARCADORES_MIDIA = ("<Mídia oculta>", "(arquivo anexado)", "(anexado)", "<anexado:", ".jpg", ".opus",
+                    "<Media omitted>", "(file attached)", "<attached:")
+_RE_MARCADORES = re.compile(b"|".join(re.escape(m.encode('utf-8')) for m in MARCADORES_MIDIA))
+_RE_CABECALHO = re.compile(
+    rb"(?:\xef\xbb\xbf)?(?:\xe2\x80\x8e)?\[?(\d{1,2})[/.](\d{1,2})[/.](\d{2}|\d{4}),?[ \t](\d{1,2}):(\d{2})(?::\d{2})?"
+    rb"(?:(?:[ \t]|\xe2\x80\xaf|\xc2\xa0)?([AaPp])\.?[ \t]?[Mm]\.?)?\]?[ \t]"
+)
+
+_RE_LINHA_CABECALHO = re.compile(b"^" + _RE_CABECALHO.pattern, re.M)
+JANELA_BISSECAO = 1 << 16
+
+def _cabecalhos_midia(buf, inicio=0, fim=None):
+    """Gera o match do cabeçalho (campo1, campo2, ano, hora, minuto, am_pm) de cada linha com mídia, em ordem."""
+    linha_anterior = -1
+    for m in _RE_MARCADORES.finditer(buf, inicio, len(buf) if fim is None else fim):
+        ini_linha = buf.rfind(b"\n", 0, m.start()) + 1
+        if ini_linha == linha_anterior: continue
+        linha_anterior = ini_linha
+        c = _RE_CABECALHO.match(buf, ini_linha)
+        if c: yield c
+
+_RE_ANEXO = re.compile(rb"([^\s:<>/\\]+\.[A-Za-z0-9]{2,5}) \((?:arquivo anexado|anexado|file attached)\)|<(?:anexado|attached): ?([^>]+)>")
+
+def _detalhes_mensagem(buf, pos):
+    """Remetente e nome do arquivo anexado (ou None, p.ex. em '<Mídia oculta>') da mensagem cujo texto começa em pos."""
+    fim = buf.find(b"\n", pos)
+    resto = buf[pos:fim if fim >= 0 else len(buf)].rstrip(b"\r")
+    if resto.startswith(b"- "): resto = resto[2:]
+    remetente, _, texto = resto.partition(b": ")
+    a = _RE_ANEXO.search(texto)
+    arquivo = (a.group(1) or a.group(2)).strip().decode('utf-8', 'replace') if a else None
+    return remetente.decode('utf-8', 'replace').strip("\u200e "), arquivo
+
+def _data_ordinal(c1, c2, ano, mes_primeiro):
+    dia, mes = (int(c2), int(c1)) if mes_primeiro else (int(c1), int(c2))
+    a = int(ano); a += 2000 if a < 100 else 0
+    try: return datetime.date(a, mes, dia).toordinal(), f"{dia:02d}/{mes:02d}/{a}"
+    except ValueError: return None
+
+def _ordem_das_datas(buf):
+    """True se o chat usa mm/dd, False se dd/mm, None se as amostras (início, meio e fim) não decidem."""
+    primeiro = segundo = False
+    for pos in (0, len(buf) // 2, max(0, len(buf) - 4 * JANELA_BISSECAO)):
+        for c in _RE_LINHA_CABECALHO.finditer(buf, pos, min(len(buf), pos + 4 * JANELA_BISSECAO)):
+            primeiro |= int(c.group(1)) > 12; segundo |= int(c.group(2)) > 12
+    if primeiro != segundo: return segundo
+    return None
+
+def _posicao_da_data(buf, ordinal, mes_primeiro):
+    """Bisseção pelo chat (que é cronológico): posição de uma linha antes da primeira mensagem com data >= ordinal."""
+    lo, hi = 0, len(buf)
+    while hi - lo > JANELA_BISSECAO:
+        meio = (lo + hi) // 2; c = _RE_LINHA_CABECALHO.search(buf, meio, hi)
+        while c:
+            data = _data_ordinal(*c.groups()[:3], mes_primeiro)
+            if data: break
+            c = _RE_LINHA_CABECALHO.search(buf, c.end(), hi)
+        if c is None or data[0] >= ordinal: hi = meio
+        else: lo = meio
+    return buf.rfind(b"\n", 0, lo) + 1
+
+def horarios_de_midia(buf, d_ini, d_fim):
+    """Data/hora ('dd/mm/aaaa', 'HH:MM'), remetente e arquivo anexado das mensagens com mídia entre d_ini e d_fim,
+    na ordem do chat.
+    `buf` é bytes ou mmap do .txt exportado. Datas são comparadas por ordinal e decodificadas uma vez por valor;
+    quando a ordem dia/mês é conhecida, só o trecho do período (achado por bisseção) é varrido."""
+    o_ini, o_fim = d_ini.toordinal(), d_fim.toordinal()
+    mes_primeiro = _ordem_das_datas(buf)
+    if mes_primeiro is None:
+        inicio, fim = 0, len(buf)
+        cabecalhos = list(_cabecalhos_midia(buf))
+        # Exportações em inglês americano trazem mm/dd: só se nota quando algum segundo campo passa de 12
+        chaves = {c.groups()[:2] for c in cabecalhos}
+        mes_primeiro = any(int(c2) > 12 for _, c2 in chaves) and not any(int(c1) > 12 for c1, _ in chaves)
+    else:
+        inicio = _posicao_da_data(buf, o_ini, mes_primeiro)
+        fim = len(buf)
+        for c in _RE_LINHA_CABECALHO.finditer(buf, _posicao_da_data(buf, o_fim + 1, mes_primeiro)):
+            data = _data_ordinal(*c.groups()[:3], mes_primeiro)
+            if data and data[0] > o_fim: fim = c.start(); break
+        cabecalhos = _cabecalhos_midia(buf, inicio, fim)
+    datas = {}; horarios = []
+    for c in cabecalhos:
+        c1, c2, ano, hh, mm, ampm = c.groups()
+        chave = (c1, c2, ano)
+        data = datas.get(chave, False)
+        if data is False: data = datas[chave] = _data_ordinal(c1, c2, ano, mes_primeiro)
+        if data is None or not (o_ini <= data[0] <= o_fim): continue
+        h = int(hh)
+        if ampm: h = h % 12 + (12 if ampm in b"Pp" else 0)
+        remetente, arquivo = _detalhes_mensagem(buf, c.end())
+        horarios.append({'data': data[1], 'hora': f"{h:02d}:{mm.decode()}", 'remetente': remetente, 'arquivo': arquivo})
+    return horarios
+
+# --- RECONHECIMENTO DE UMA FOTO (compartilhado pelo modo sequencial e pelos processos) ---
+def carregar_imagem(p, reducao=1):
+    """Decodifica a foto como array RGB uint8 contíguo (o formato que o dlib espera, sem cópia extra).
+    Com reducao > 1 o JPEG é decodificado direto na escala menor pelo próprio decodificador (draft),
+    sem passar pela resolução cheia; outros formatos são reduzidos pela média dos blocos."""
+    from PIL import Image
+    with abrir_midia(p) as f:
+        im = Image.open(f)
+        if reducao > 1:
+            if im.format == 'JPEG': im.draft('RGB', (im.width // reducao, im.height // reducao))
+            else: im = im.convert('RGB').reduce(reducao)
+        return np.array(im.convert('RGB'))
+
+# --- FOTOS REPETIDAS (reenvios e cópias recomprimidas pelo WhatsApp) ---
+LADO_HASH_PERCEPTUAL = 16
+LIMIAR_DUPLICATA = 8  # bits diferentes (de 256) para duas fotos ainda contarem como a mesma
+
+def hash_perceptual(p):
+    """dHash de 256 bits: a foto é decodificada na menor escala do JPEG (draft), reduzida a 17x16 tons de cinza
+    e cada bit diz se o pixel é mais claro que o vizinho à direita. Recompressões dão o mesmo hash ou quase."""
+    from PIL import Image
+    n = LADO_HASH_PERCEPTUAL
+    with abrir_midia(p) as f:
+        im = Image.open(f)
+        if im.format == 'JPEG': im.draft('L', (8 * n, 8 * n))
+        px = np.asarray(im.convert('L').resize((n + 1, n), Image.BILINEAR), dtype=np.int16)
+    return int.from_bytes(np.packbits(px[:, 1:] > px[:, :-1]).tobytes(), 'big')
+
+def agrupar_duplicatas(hashes, limiar=LIMIAR_DUPLICATA):
+    """Para cada hash (ou None), o índice do representante do seu grupo: o primeiro hash a até `limiar` bits dele.
+    Os candidatos saem de limiar+1 faixas do hash: com até `limiar` bits diferentes, ao menos uma faixa é idêntica."""
+    n_faixas = limiar + 1
+    largura = -(-LADO_HASH_PERCEPTUAL * LADO_HASH_PERCEPTUAL // n_faixas); mascara = (1 << largura) - 1
+    faixas = [{} for _ in range(n_faixas)]
+    grupos = []
+    for i, h in enumerate(hashes):
+        rep = i
+        if h is not None:
+            chaves = [(h >> (k * largura)) & mascara for k in range(n_faixas)]
+            candidatos = sorted({c for k, ch in enumerate(chaves) for c in faixas[k].get(ch, ())})
+            for c in candidatos:
+                if (hashes[c] ^ h).bit_count() <= limiar: rep = c; break
+            if rep == i:
+                for k, ch in enumerate(chaves): faixas[k].setdefault(ch, []).append(i)
+        grupos.append(rep)
+    return grupos
+
+# Etapas da cascata de detecção: cada uma recebe `imagem(reducao)` (decodificação preguiçosa, compartilhada
+# entre as etapas da mesma foto) e devolve (imagem usada, rostos localizados); os encodings saem depois, uma vez só.
+def _etapa_metade(imagem, fr): im = imagem(2); return im, fr.face_locations(im)
+def _etapa_cheia(imagem, fr): im = imagem(1); return im, fr.face_locations(im)
+def _etapa_upsample2(imagem, fr): im = imagem(1); return im, fr.face_locations(im, number_of_times_to_upsample=2, model="hog")
+
+ETAPAS_DETECCAO = {'metade': _etapa_metade, 'cheia': _etapa_cheia, 'upsample2': _etapa_upsample2}
+CASCATA_PADRAO = ('metade', 'cheia', 'upsample2')
+
+class CascataDeteccao:
+    """Cascata de detecção que se ajusta ao export atual. Registra, por etapa, tentativas, acertos e tempo;
+    depois de MIN_AMOSTRAS fotos reordena as etapas pelo custo por acerto e pula as que quase nunca acham rosto
+    (a cada EXPLORAR_A_CADA fotos roda a ordem configurada inteira, para não perder a mudança de perfil).
+    Com `orcamento` (segundos por foto), uma etapa não começa se o tempo médio dela estouraria o limite."""
+    MIN_AMOSTRAS = 20
+    TAXA_MINIMA = 0.02
+    EXPLORAR_A_CADA = 10
+
+    def __init__(self, etapas=CASCATA_PADRAO, orcamento=None):
+        desconhecidas = [e for e in etapas if e not in ETAPAS_DETECCAO]
+        if desconhecidas or not etapas: raise ValueError(f"Etapas de detecção inválidas: {desconhecidas or etapas}")
+        self.etapas = list(etapas)
+        self.orcamento = orcamento or None
+        self.stats = {e: {'tentativas': 0, 'acertos': 0, 'tempo': 0.0} for e in self.etapas}
+        self.fotos = 0; self.sem_rosto = 0; self.estouros = 0; self.puladas = 0
+
+    @classmethod
+    def da_config(cls, config):
+        return cls(config.get('cascata', CASCATA_PADRAO), config.get('orcamento_foto'))
+
+    def _tempo_medio(self, e):
+        st = self.stats[e]
+        return st['tempo'] / st['tentativas'] if st['tentativas'] else 0.0
+
+    def ordem(self):
+        """Etapas a tentar na próxima foto e etapas puladas."""
+        if self.fotos < self.MIN_AMOSTRAS or self.fotos % self.EXPLORAR_A_CADA == 0: return list(self.etapas), []
+        ativas, puladas = [], []
+        for e in self.etapas:
+            st = self.stats[e]
+            if st['tentativas'] >= self.MIN_AMOSTRAS and st['acertos'] / st['tentativas'] < self.TAXA_MINIMA: puladas.append(e)
+            else: ativas.append(e)
+        if not ativas:
+            # Nunca deixar a foto sem detecção nenhuma: a etapa mais barata continua ativa
+            mais_barata = min(puladas, key=self._tempo_medio)
+            puladas.remove(mais_barata); ativas.append(mais_barata)
+        def custo_por_acerto(e):
+            st = self.stats[e]
+            if not st['tentativas']: return 0.0
+            return self._tempo_medio(e) / max(st['acertos'] / st['tentativas'], self.TAXA_MINIMA)
+        ativas.sort(key=custo_por_acerto)
+        return ativas, puladas
+
+    def detectar(self, p):
+        """Roda a cascata na foto. Retorna (encodings, registro), onde o registro diz qual etapa achou o rosto,
+        quanto a detecção de cada etapa tentada levou e o tempo de decodificação e de encoding."""
+        import face_recognition
+        imagens = {}
+        registro = {'etapa': None, 'tempos': {}, 'puladas': [], 'estouro': False, 'decodificacao': 0.0, 'codificacao': 0.0}
+        def imagem(reducao):
+            if reducao not in imagens:
+                t = time.perf_counter(); imagens[reducao] = carregar_imagem(p, reducao)
+                registro['decodificacao'] += time.perf_counter() - t
+            return imagens[reducao]
+        ativas, registro['puladas'] = self.ordem()
+        inicio = time.perf_counter(); encs = []
+        for e in ativas:
+            gasto = time.perf_counter() - inicio
+            if self.orcamento and registro['tempos'] and gasto + self._tempo_medio(e) > self.orcamento:
+                registro['estouro'] = True; break
+            t = time.perf_counter(); decod = registro['decodificacao']
+            im, locs = ETAPAS_DETECCAO[e](imagem, face_recognition)
+            registro['tempos'][e] = time.perf_counter() - t - (registro['decodificacao'] - decod)
+            if locs:
+                t = time.perf_counter()
+                encs = face_recognition.face_encodings(im, known_face_locations=locs)
+                registro['codificacao'] = time.perf_counter() - t
+                registro['etapa'] = e; break
+        self.acumular(registro)
+        return encs, registro
+
+    def acumular(self, registro):
+        """Soma o registro de uma foto às estatísticas (usado também com os registros vindos dos processos)."""
+        self.fotos += 1
+        for e, t in registro['tempos'].items():
+            st = self.stats.setdefault(e, {'tentativas': 0, 'acertos': 0, 'tempo': 0.0})
+            st['tentativas'] += 1; st['tempo'] += t
+        if registro['etapa']: self.stats[registro['etapa']]['acertos'] += 1
+        else: self.sem_rosto += 1
+        if registro['estouro']: self.estouros += 1
+        if registro['puladas']: self.puladas += 1
+
+    def relatorio(self):
+        linhas = []
+        for e, st in self.stats.items():
+            if not st['tentativas']: continue
+            linhas.append(f"{e}: {st['acertos']}/{st['tentativas']} acertos ({100 * st['acertos'] / st['tentativas']:.0f}%), "
+                          f"{self._tempo_medio(e):.2f}s por tentativa, {st['tempo']:.1f}s no total")
+        linhas.append(f"{self.fotos} fotos, {self.sem_rosto} sem rosto, {self.puladas} com etapas puladas, {self.estouros} cortadas pelo orçamento")
+        return linhas
+
+def reconhecer_foto(p, galeria, tol, cascata):
+    """Retorna (matches, encodings, registro da cascata); sem rosto = [("Desconhecido", None, None)] e encodings vazio."""
+    encs, registro = cascata.detectar(p)
+    t = time.perf_counter()
+    matches = galeria.comparar(encs, tol) if encs else [("Desconhecido", None, None)]
+    registro['comparacao'] = time.perf_counter() - t
+    return matches, encs, registro
+
+# Estado de cada processo do pool: a galeria é montada uma única vez no initializer
+_galeria_worker = None
+_tol_worker = None
+_cascata_worker = None
+
+def _iniciar_worker(encodings, nomes, tol, etapas=CASCATA_PADRAO, orcamento=None):
+    global _galeria_worker, _tol_worker, _cascata_worker
+    _galeria_worker = GaleriaRostos(encodings, nomes)
+    _tol_worker = tol
+    _cascata_worker = CascataDeteccao(etapas, orcamento)
+
+def _reconhecer_no_worker(idx, p):
+    try: return (idx, *reconhecer_foto(p, _galeria_worker, _tol_worker, _cascata_worker))
+    except Exception: return idx, None, None, None
+
+# --- ENVIO PARA O GOOGLE SHEETS ---
+class PlanilhaGoogle:
+    """Worksheet do Google Sheets autorizada uma única vez e reaproveitada entre os envios."""
+    def __init__(self, credenciais="credentials.json", nome=NOME_PLANILHA_GOOGLE):
+        self.credenciais = credenciais
+        self.nome = nome
+        self._sheet = None
+        self.lock = threading.Lock()
+
+    def _worksheet(self):
+        with self.lock:
+            if self._sheet is None:
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
+                scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+                creds = ServiceAccountCredentials.from_json_keyfile_name(self.credenciais, scope)
+                self._sheet = gspread.authorize(creds).open(self.nome).sheet1
+            return self._sheet
+
+    def append_rows(self, linhas):
+        self._worksheet().append_rows(linhas)
+
+class PlanilhaLocal:
+    """Worksheet falsa (só append_rows) para testes e benchmarks do envio, sem rede.
+    `falhas` faz as primeiras N chamadas levantarem ConnectionError; `caminho_csv` grava as linhas recebidas."""
+    def __init__(self, caminho_csv=None, falhas=0, latencia=0.0):
+        self.caminho_csv = caminho_csv
+        self.falhas = falhas
+        self.latencia = latencia
+        self.linhas = []
+        self.chamadas = 0
+
+    def append_rows(self, linhas):
+        self.chamadas += 1
+        if self.latencia: time.sleep(self.latencia)
+        if self.falhas > 0:
+            self.falhas -= 1
+            raise ConnectionError("Falha simulada da planilha local")
+        self.linhas.extend(linhas)
+        if self.caminho_csv:
+            with open(self.caminho_csv, "a", newline="", encoding="utf-8") as f: csv.writer(f).writerows(linhas)
+
+class IndiceSincronizados:
+    """Chaves (funcionário, data, hora, hash do arquivo) das linhas que a planilha já confirmou.
+    Arquivo texto só de acréscimo: cada lote confirmado adiciona suas chaves no fim."""
+    def __init__(self, caminho=ARQUIVO_SINCRONIZADOS):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self.chaves = set()
+        if os.path.exists(caminho):
+            try:
+                with open(caminho, 'r', encoding='utf-8') as f: self.chaves = {l.rstrip('\n') for l in f if l.strip()}
+            except OSError as e: log_debug(f"Erro ao ler índice de sincronizados: {e}")
+
+    @staticmethod
+    def chave(nome, data, hora, hash_arquivo):
+        return f"{nome}|{data}|{hora}|{hash_arquivo}"
+
+    def __contains__(self, chave):
+        with self.lock: return chave in self.chaves
+
+    def adicionar(self, chaves):
+        with self.lock:
+            novas = [c for c in chaves if c and c not in self.chaves]
+            if not novas: return
+            self.chaves.update(novas)
+            with open(self.caminho, 'a', encoding='utf-8') as f: f.write(''.join(c + '\n' for c in novas))
+
+class SaidaSheets:
+    """Outbox persistente das linhas a enviar para a planilha.
+
+    As linhas são gravadas em disco antes do envio e só saem do arquivo depois que a planilha
+    confirmou o lote. O envio é feito em lotes de `tamanho_lote`, com backoff exponencial entre
+    as tentativas; o que sobrar pendente é reenviado na próxima drenagem (ex.: ao abrir o programa).
+    """
+    def __init__(self, planilha=None, caminho=ARQUIVO_OUTBOX_SHEETS, tamanho_lote=500, tentativas=5, espera_inicial=1.0, espera_maxima=60.0, indice=None):
+        self.planilha = planilha if planilha is not None else PlanilhaGoogle()
+        self.indice = indice if indice is not None else IndiceSincronizados()
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.lock = threading.Lock()
+        self.lock_envio = threading.Lock()
+        self.itens = []
+        self.carregar()
+
+    def carregar(self):
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, 'r', encoding='utf-8') as f: self.itens = json.load(f)
+            except (OSError, json.JSONDecodeError) as e: log_debug(f"Outbox do Sheets ilegível, ignorando: {e}")
+
+    def _persistir(self):
+        tmp = self.caminho + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(self.itens, f)
+        os.replace(tmp, self.caminho)
+
+    def enfileirar(self, linhas, chaves=None):
+        """Coloca as linhas na fila, ignorando as que já foram confirmadas ou já estão pendentes.
+        Retorna quantas linhas entraram."""
+        agora = time.time()
+        if chaves is None: chaves = [None] * len(linhas)
+        with self.lock:
+            vistas = {i.get('chave') for i in self.itens if i['status'] == 'pendente'}
+            novos = []
+            for l, c in zip(linhas, chaves):
+                if c is not None and (c in vistas or c in self.indice): continue
+                vistas.add(c)
+                novos.append({'linha': l, 'chave': c, 'status': 'pendente', 'tentativas': 0, 'criado': agora})
+            if novos:
+                self.itens.extend(novos)
+                self._persistir()
+            return len(novos)
+
+    def pendentes(self):
+        with self.lock: return sum(1 for i in self.itens if i['status'] == 'pendente')
+
+    def drenar(self, log=log_debug):
+        """Envia tudo o que está pendente. Retorna True se a fila ficou vazia."""
+        with self.lock_envio:
+            while True:
+                with self.lock: lote = [i for i in self.itens if i['status'] == 'pendente'][:self.tamanho_lote]
+                if not lote: return True
+                espera = self.espera_inicial
+                for tentativa in range(1, self.tentativas + 1):
+                    try:
+                        self.planilha.append_rows([i['linha'] for i in lote])
+                        break
+                    except Exception as e:
+                        with self.lock:
+                            for i in lote: i['tentativas'] += 1; i['erro'] = str(e)
+                        if tentativa == self.tentativas:
+                            with self.lock: self._persistir()
+                            log(f"⚠️ Sheets indisponível ({e}); {self.pendentes()} linhas continuam na fila.")
+                            return False
+                        time.sleep(espera); espera = min(espera * 2, self.espera_maxima)
+                self.indice.adicionar([i.get('chave') for i in lote])
+                with self.lock:
+                    for i in lote: i['status'] = 'enviado'
+                    # Só as pendentes ficam no arquivo; o lote confirmado sai da fila
+                    self.itens = [i for i in self.itens if i['status'] == 'pendente']
+                    self._persistir()
+                log(f"📤 {len(lote)} linhas enviadas ({self.pendentes()} pendentes).")
+
+    def drenar_em_segundo_plano(self, log=log_debug):
+        t = threading.Thread(target=self.drenar, kwargs={'log': log}, daemon=True)
+        t.start()
+        return t
+
+# --- BATIDAS EM COLUNAS ---
+HORAS_TEXTO = [f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)]
+
+def _dias_de_texto(datas, iso=False):
+    """Datas 'dd/mm/aaaa' (ou 'aaaa-mm-dd' com iso=True) -> datetime64[D], reordenando os bytes em bloco."""
+    b = np.asarray(datas, dtype='S10')
+    if not iso:
+        u = b.view(np.uint8).reshape(-1, 10)[:, [6, 7, 8, 9, 2, 3, 4, 5, 0, 1]]
+        u[:, [4, 7]] = ord('-')
+        b = np.ascontiguousarray(u).view('S10').ravel()
+    return b.astype('datetime64[D]')
+
+def _minutos_de_texto(horas):
+    """Horas 'HH:MM' -> minuto do dia (int16); '--:--' vira -1."""
+    u = np.asarray(horas, dtype='S5').view(np.uint8).reshape(-1, 5).astype(np.int16) - ord('0')
+    minutos = u[:, 0] * 600 + u[:, 1] * 60 + u[:, 3] * 10 + u[:, 4]
+    minutos[u[:, 0] < 0] = -1
+    return minutos
+
+def _codificar(valores):
+    """(valores distintos na ordem em que aparecem, array com o índice de cada valor nessa lista)."""
+    distintos = list(dict.fromkeys(valores))
+    indice = dict(zip(distintos, range(len(distintos))))
+    return distintos, np.fromiter(map(indice.__getitem__, valores), dtype=np.int32, count=len(valores))
+
+class BatidasColunares:
+    """Batidas em colunas NumPy: código do funcionário (`cod`, índice em `nomes`, que vem ordenado), dia
+    (datetime64[D]) e minuto do dia (int16). Primeira e última batida por funcionário-dia e banco de horas saem
+    de operações vetorizadas (argsort + reduceat), sem dict por batida. O filtro por período/funcionário fica no
+    SQL de BancoPonto.consultar_colunas, que usa os índices da tabela."""
+    def __init__(self, nomes, cod, dia, minuto):
+        self.nomes = np.asarray(nomes, dtype=object)
+        self.cod = np.asarray(cod, dtype=np.int32)
+        self.dia = np.asarray(dia, dtype='datetime64[D]')
+        self.minuto = np.asarray(minuto, dtype=np.int16)
+
+    @classmethod
+    def de_colunas(cls, nomes, datas, horas, iso=False):
+        # Cada coluna tem poucos valores distintos (funcionários, dias, minutos): só eles são convertidos
+        nomes_unicos, cod = _codificar(nomes)
+        ordem = sorted(range(len(nomes_unicos)), key=nomes_unicos.__getitem__)
+        posicao = np.empty(len(ordem), dtype=np.int32); posicao[ordem] = np.arange(len(ordem))
+        datas_unicas, cod_data = _codificar(datas)
+        horas_unicas, cod_hora = _codificar(horas)
+        return cls([nomes_unicos[i] for i in ordem], posicao[cod], _dias_de_texto(datas_unicas, iso)[cod_data],
+                   _minutos_de_texto(horas_unicas)[cod_hora])
+
+    @classmethod
+    def de_registros(cls, registros):
+        """De dicts com 'nome', 'data' (dd/mm/aaaa) e 'hora', como dados_consolidados e consultar_batidas."""
+        return cls.de_colunas([r['nome'] for r in registros], [r['data'] for r in registros], [r['hora'] for r in registros])
+
+    @classmethod
+    def de_relatorio(cls, linhas):
+        """Das linhas de relatório (Nome/Data/Entrada/Saída): cada linha vira até duas batidas."""
+        b = cls.de_colunas([l['Nome'] for l in linhas] * 2, [l['Data'] for l in linhas] * 2,
+                           [l['Entrada'] for l in linhas] + [l['Saída'] for l in linhas])
+        return b.selecionar(b.minuto >= 0)
+
+    def __len__(self):
+        return len(self.cod)
+
+    def selecionar(self, mascara):
+        return BatidasColunares(self.nomes, self.cod[mascara], self.dia[mascara], self.minuto[mascara])
+
+    def por_dia(self):
+        """(cod, dia, primeira, ultima, quantidade) de cada funcionário-dia, ordenado por funcionário e dia."""
+        if not len(self):
+            vazio = np.array([], dtype=np.int32)
+            return vazio, np.array([], dtype='datetime64[D]'), vazio.astype(np.int16), vazio.astype(np.int16), vazio
+        # Uma chave inteira funcionário-dia: um argsort só, e os grupos são as mudanças de chave
+        dia = self.dia.astype(np.int64)
+        primeiro_dia = dia.min()
+        chave = self.cod.astype(np.int64) * (dia.max() - primeiro_dia + 1) + (dia - primeiro_dia)
+        ordem = np.argsort(chave)
+        chave, minuto = chave[ordem], self.minuto[ordem]
+        inicios = np.flatnonzero(np.r_[True, chave[1:] != chave[:-1]])
+        return (self.cod[ordem[inicios]], self.dia[ordem[inicios]], np.minimum.reduceat(minuto, inicios),
+                np.maximum.reduceat(minuto, inicios), np.diff(np.append(inicios, len(chave))))
+
+    def saldos(self, meta_minutos=450, intervalo_minutos=60):
+        """Banco de horas (minutos) por código de funcionário: em cada dia com entrada e saída distintas,
+        (saída - entrada - intervalo) - meta diária. Dias com uma batida só não contam."""
+        cod, _, primeira, ultima, _ = self.por_dia()
+        conta = primeira != ultima
+        saldo = ultima[conta].astype(np.int64) - primeira[conta] - intervalo_minutos - meta_minutos
+        return np.bincount(cod[conta], weights=saldo, minlength=len(self.nomes)).astype(np.int64)
+
+    def linhas_relatorio(self):
+        """Linhas Nome/Data/Entrada/Saída (uma por funcionário-dia), ordenadas por data e nome."""
+        cod, dia, primeira, ultima, n = self.por_dia()
+        ordem = np.lexsort((cod, dia))
+        dias_unicos, idx_dia = np.unique(dia[ordem], return_inverse=True)
+        datas_txt = [f"{d.day:02d}/{d.month:02d}/{d.year}" for d in dias_unicos.astype(object)]
+        nomes = self.nomes
+        return [{"Nome": nomes[c], "Data": datas_txt[i], "Entrada": HORAS_TEXTO[p], "Saída": HORAS_TEXTO[u] if k > 1 else "--:--"}
+                for c, i, p, u, k in zip(cod[ordem].tolist(), idx_dia.tolist(), primeira[ordem].tolist(), ultima[ordem].tolist(), n[ordem].tolist())]
+
+# --- RELATÓRIO DE ENTRADA/SAÍDA ---
+def agregar_relatorio(batidas, cancelar=None):
+    """Primeira e última batida de cada funcionário por dia, ordenado por data.
+    batidas: dicts com 'nome', 'data' (dd/mm/aaaa) e 'hora' (HH:MM), como os de BancoPonto.consultar_batidas,
+    ou um BatidasColunares. `cancelar` (threading.Event) é consultado entre as etapas; se sinalizado, retorna None."""
+    colunas = batidas if isinstance(batidas, BatidasColunares) else BatidasColunares.de_registros(batidas)
+    if cancelar is not None and cancelar.is_set(): return None
+    return colunas.linhas_relatorio()
+
+def exportar_relatorio_csv(caminho, linhas):
+    with open(caminho, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=linhas[0].keys())
+        writer.writeheader()
+        writer.writerows(linhas)
+
+def exportar_relatorio_excel(caminho, linhas):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(list(linhas[0].keys()))
+    for row in linhas: sheet.append(list(row.values()))
+    workbook.save(caminho)
+
+# --- MÉTRICAS DA EXECUÇÃO ---
+PASTA_METRICAS = "metricas"
+
+class MetricasExecucao:
+    """Tempo por etapa e contadores de uma execução do pipeline. Ao final são gravados em `PASTA_METRICAS` como
+    JSON e no formato texto do Prometheus (um par de arquivos por execução), para comparar execuções."""
+    def __init__(self):
+        self.inicio = datetime.datetime.now()
+        self.etapas = {}
+        self.contadores = {}
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def etapa(self, nome):
+        t = time.perf_counter()
+        try: yield
+        finally: self.adicionar_tempo(nome, time.perf_counter() - t)
+
+    def adicionar_tempo(self, nome, segundos):
+        with self.lock:
+            e = self.etapas.setdefault(nome, {'segundos': 0.0, 'vezes': 0})
+            e['segundos'] += segundos; e['vezes'] += 1
+
+    def contar(self, nome, n=1):
+        with self.lock: self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    def registrar_foto(self, registro, matches, encs):
+        """Soma o registro da cascata de uma foto (decodificação, detecção por etapa, encoding, comparação)."""
+        if registro:
+            if registro.get('decodificacao'): self.adicionar_tempo('decodificacao', registro['decodificacao'])
+            for e, t in registro['tempos'].items(): self.adicionar_tempo(f'deteccao_{e}', t)
+            if registro.get('codificacao'): self.adicionar_tempo('codificacao', registro['codificacao'])
+            if 'comparacao' in registro: self.adicionar_tempo('comparacao', registro['comparacao'])
+        if matches is None: self.contar('fotos_com_erro'); return
+        self.contar('fotos_analisadas'); self.contar('rostos', len(encs))
+
+    def resumo(self):
+        with self.lock: etapas = {k: dict(v) for k, v in self.etapas.items()}; c = dict(self.contadores)
+        analisadas = c.get('fotos_analisadas', 0)
+        reconhecimento = etapas.get('reconhecimento', {}).get('segundos', 0.0)
+        derivados = {
+            'fotos_por_segundo': analisadas / reconhecimento if reconhecimento else 0.0,
+            'rostos_por_foto': c.get('rostos', 0) / analisadas if analisadas else 0.0,
+            'taxa_desconhecidos': c.get('desconhecidos', 0) / c['registros'] if c.get('registros') else 0.0,
+        }
+        return {'inicio': self.inicio.isoformat(timespec='seconds'), 'etapas': etapas, 'contadores': c, 'derivados': derivados}
+
+    def prometheus(self, r=None):
+        r = r or self.resumo()
+        linhas = ["# HELP ponto_etapa_segundos Tempo gasto em cada etapa da execução.", "# TYPE ponto_etapa_segundos gauge"]
+        linhas += [f'ponto_etapa_segundos{{etapa="{k}"}} {v["segundos"]:.6f}' for k, v in sorted(r['etapas'].items())]
+        linhas += ["# HELP ponto_contador Contadores da execução.", "# TYPE ponto_contador gauge"]
+        linhas += [f'ponto_contador{{nome="{k}"}} {v}' for k, v in sorted(r['contadores'].items())]
+        for k, v in r['derivados'].items(): linhas += [f"# TYPE ponto_{k} gauge", f"ponto_{k} {v:.6f}"]
+        return "\n".join(linhas) + "\n"
+
+    def linhas(self, r=None):
+        """Resumo curto para a tela: as etapas mais demoradas e os derivados."""
+        r = r or self.resumo()
+        etapas = sorted(r['etapas'].items(), key=lambda kv: -kv[1]['segundos'])
+        d = r['derivados']
+        return [f"{k}: {v['segundos']:.2f}s" for k, v in etapas[:6]] + [
+            f"{d['fotos_por_segundo']:.2f} fotos/s · {d['rostos_por_foto']:.2f} rostos/foto · {100 * d['taxa_desconhecidos']:.0f}% desconhecidos"]
+
+    def salvar(self, pasta=PASTA_METRICAS):
+        """Grava execucao_<início com microssegundos>.json e .prom em `pasta`. Retorna o caminho do JSON."""
+        r = self.resumo()
+        os.makedirs(pasta, exist_ok=True)
+        base = os.path.join(pasta, f"execucao_{self.inicio:%Y%m%d_%H%M%S_%f}")
+        # O relógio pode ter resolução de milissegundos (Windows): execuções coladas ganham um sufixo
+        candidato, n = base, 1
+        while os.path.exists(candidato + ".json"): n += 1; candidato = f"{base}_{n}"
+        base = candidato
+        with open(base + ".json", "w", encoding="utf-8") as f: json.dump(r, f, ensure_ascii=False, indent=2)
+        with open(base + ".prom", "w", encoding="utf-8") as f: f.write(self.prometheus(r))
+        return base + ".json"
+
+# --- PIPELINE ---
+class MotorPonto:
+    """Pipeline de reconhecimento sem interface. As mensagens de andamento vão para `fila` no mesmo
+    formato consumido por AppPonto.verificar_fila ({'acao': 'log', ...}, {'acao': 'progresso', ...})."""
+    def __init__(self, pasta_funcionarios="funcionarios", config=None, fila=None, planilha=None):
+        self.pasta_funcionarios = pasta_funcionarios
+        self.config = config if config is not None else {}
+        self.queue = fila if fila is not None else queue.Queue()
+        self.parar_execucao = False
+        self.caminho_zip = ""
+        self.temp_dir = None
+        self.banco = BancoPonto()
+        self.cache_encodings = CacheEncodings(self.banco)
+        self.saida_sheets = SaidaSheets(planilha)
+        self.conhecidos_enc = []; self.conhecidos_nom = []
+        self.galeria = GaleriaRostos([], [])
+        self.cascata = CascataDeteccao()
+        self.metricas = MetricasExecucao()
+
+    def preparing_arquivos(self):
+        if self.config.get('extrair_zip', False): return self.extrair_arquivos()
+        # Modo padrão: lê o .txt e as mídias direto do ZIP; nada é extraído para o disco
+        self.queue.put({'acao': 'log', 'texto': "📦 Lendo ZIP..."})
+        self.temp_dir = None
+        with zipfile.ZipFile(self.caminho_zip, 'r') as zip_ref: membros = [i.filename for i in zip_ref.infolist() if not i.is_dir()]
+        caminho_txt = None; media_files = []
+        for membro in membros:
+            file = posixpath.basename(membro)
+            if file.endswith(".txt") and "chat" in file.lower(): caminho_txt = MidiaZip(self.caminho_zip, membro)
+            elif file.endswith(".txt") and not caminho_txt: caminho_txt = MidiaZip(self.caminho_zip, membro)
+            if "-WA" in file or file.lower().endswith(('.jpg','.opus','.mp4','.webp')): media_files.append(MidiaZip(self.caminho_zip, membro))
+        if not caminho_txt: raise Exception("ZIP inválido.")
+        media_files.sort(key=lambda m: m.nome)
+        return None, caminho_txt, media_files
+
+    def extrair_arquivos(self):
+        self.queue.put({'acao': 'log', 'texto': "📦 Extraindo ZIP..."})
+        self.temp_dir = tempfile.mkdtemp()
+        with zipfile.ZipFile(self.caminho_zip, 'r') as zip_ref: zip_ref.extractall(self.temp_dir)
+        caminho_txt = None; media_files = []
+        for root, dirs, files in os.walk(self.temp_dir):
+            for file in files:
+                if file.endswith(".txt") and "chat" in file.lower(): caminho_txt = os.path.join(root, file)
+                elif file.endswith(".txt") and not caminho_txt: caminho_txt = os.path.join(root, file)
+                if "-WA" in file or file.lower().endswith(('.jpg','.opus','.mp4','.webp')): media_files.append(os.path.join(root, file))
+        if not caminho_txt: raise Exception("ZIP inválido.")
+        media_files.sort()
+        return self.temp_dir, caminho_txt, media_files
+
+    def parear_midias(self, horarios, arquivos):
+        """Liga cada mensagem com mídia ao seu arquivo pelo nome do anexo (IMG-AAAAMMDD-WAnnnn.jpg, <anexado: ...>).
+        Mídias sem mensagem no período ficam de fora. Exportações que não trazem o nome do anexo
+        ('<Mídia oculta>') caem no pareamento por posição."""
+        por_nome = {nome_midia(a).lower(): a for a in arquivos}
+        if not any(h.get('arquivo') for h in horarios): return list(zip(arquivos, horarios))
+        pares = []; sem_arquivo = 0
+        for h in horarios:
+            arq = por_nome.get((h.get('arquivo') or '').lower())
+            if arq is None: sem_arquivo += 1; continue
+            pares.append((arq, h))
+        if sem_arquivo: self.log(f"⚠️ {sem_arquivo} mensagens com mídia sem arquivo correspondente no ZIP.")
+        return pares
+
+    def obter_horarios_validos(self, caminho_txt, d_ini, d_fim):
+        try:
+            with abrir_bytes(caminho_txt) as buf: return horarios_de_midia(buf, d_ini, d_fim)
+        except Exception as e:
+            log_debug(f"Erro ao ler o chat: {e}")
+            raise Exception("Erro TXT")
+
+    def aprender_rosto(self, origem, nome):
+        try:
+            ts = int(time.time()); dest = os.path.join(self.pasta_funcionarios, f"{nome}_auto_{ts}.jpg")
+            with abrir_midia(origem) as src, open(dest, 'wb') as dst: shutil.copyfileobj(src, dst)
+            self.cache_encodings.invalidar(dest)
+            self.queue.put({'acao': 'log', 'texto': f"🧠 Aprendido: {nome}"})
+        except: pass
+
+    def registrar_batidas(self, dados):
+        """Grava as batidas e os rótulos finais (incluindo correções manuais) no banco local.
+        Retorna o hash do arquivo de origem de cada registro."""
+        hashes = {}
+        for d in dados:
+            p = d['caminho_completo']
+            if str(p) not in hashes:
+                if d.get('hash_arquivo'): hashes[str(p)] = d['hash_arquivo']; continue
+                try: hashes[str(p)] = hash_midia(p)
+                except Exception: hashes[str(p)] = nome_midia(p)
+        lista_hashes = [hashes[str(d['caminho_completo'])] for d in dados]
+        novas = self.banco.registrar_batidas(
+            (d['nome'], d['data'], d['hora'], nome_midia(d['caminho_completo']), h, d.get('distancia'), d.get('rosto', 0)) for d, h in zip(dados, lista_hashes)
+        )
+        # Rótulo de cada rosto de cada foto; cópias idênticas (mesmo hash) contam uma vez só, senão a lista
+        # de nomes cresceria a cada execução
+        por_rosto = {}; manuais = set()
+        for d, h in zip(dados, lista_hashes):
+            por_rosto.setdefault((h, d.get('rosto', 0)), d['nome'])
+            if d.get('manual'): manuais.add(h)
+        rotulos = {}
+        for (h, rosto), nome in sorted(por_rosto.items(), key=lambda kv: kv[0][1]):
+            rotulos.setdefault(h, ([], h in manuais))[0].append(nome)
+        self.banco.atualizar_rotulos(rotulos)
+        self.log(f"💾 {novas} batidas novas gravadas no banco local.")
+        return lista_hashes
+
+    def salvar_dados(self, dados):
+        """Grava as batidas no banco e envia para a planilha. Retorna True se o envio foi concluído."""
+        if not dados: self.finalizar_metricas(); self.queue.put({'acao': 'msg_fim', 'texto': 'Nada para salvar.'}); return True
+        self.queue.put({'acao': 'log', 'texto': f"📤 Salvando {len(dados)} registros..."})
+        lista = [[d['nome'], d['data'], d['hora'], nome_midia(d['caminho_completo'])] for d in dados]
+        try:
+            try:
+                with self.metricas.etapa('banco'): hashes = self.registrar_batidas(dados)
+            except sqlite3.Error as e:
+                log_debug(f"Erro ao gravar batidas no banco: {e}")
+                hashes = [nome_midia(d['caminho_completo']) for d in dados]
+            chaves = [IndiceSincronizados.chave(d['nome'], d['data'], d['hora'], h) for d, h in zip(dados, hashes)]
+            novos = self.saida_sheets.enfileirar(lista, chaves)
+            if novos < len(lista): self.log(f"♻️ {len(lista) - novos} registros já estavam na planilha e foram ignorados.")
+            with self.metricas.etapa('sheets'): enviado = self.saida_sheets.drenar(log=self.log)
+            if enviado:
+                self.queue.put({'acao': 'msg_fim', 'texto': "Processo Finalizado com Sucesso!"})
+                return True
+            self.queue.put({'acao': 'msg_fim', 'texto': f"Erro Google Sheets: {self.saida_sheets.pendentes()} linhas ficaram na fila e serão reenviadas (PDF Disponível)."})
+            return False
+        except Exception as e:
+            log_debug(f"Erro no envio ao Sheets: {e}")
+            self.queue.put({'acao': 'msg_fim', 'texto': "Erro Google Sheets (PDF Disponível)."})
+            return False
+        finally:
+            self.finalizar_metricas()
+            fechar_zips()
+            if self.temp_dir and os.path.exists(self.temp_dir):
+                try: shutil.rmtree(self.temp_dir); log_debug("Temp limpo.")
+                except: pass
+
+    def finalizar_metricas(self):
+        """Grava as métricas da execução (JSON + Prometheus) e manda o resumo para a tela."""
+        try: self.log(f"📈 Métricas salvas em {self.metricas.salvar()}")
+        except OSError as e: log_debug(f"Erro ao salvar métricas: {e}")
+        self.queue.put({'acao': 'metricas', 'linhas': self.metricas.linhas()})
+
+    def log(self, texto):
+        self.queue.put({'acao': 'log', 'texto': texto})
+
+    def carregar_galeria(self):
+        self.conhecidos_enc = []; self.conhecidos_nom = []
+        self.queue.put({'acao': 'log', 'texto': "🧠 Carregando Faces..."})
+        if os.path.exists(self.pasta_funcionarios):
+            paths_galeria = []; novos = 0
+            for f in os.listdir(self.pasta_funcionarios):
+                if f.lower().endswith(('jpg', 'png')):
+                    p = os.path.join(self.pasta_funcionarios, f); paths_galeria.append(p)
+                    try:
+                        achou, enc = self.cache_encodings.obter(p)
+                        if not achou:
+                            enc = codificar_referencia(p); self.cache_encodings.registrar(p, enc); novos += 1
+                        if enc is not None: self.conhecidos_enc.append(enc); self.conhecidos_nom.append(os.path.splitext(f)[0].split('_')[0].capitalize())
+                    except: pass
+            self.cache_encodings.podar(paths_galeria); self.cache_encodings.salvar()
+            self.queue.put({'acao': 'log', 'texto': f"🧠 {len(paths_galeria)} referências ({novos} novas codificadas)."})
+        self.galeria = GaleriaRostos(self.conhecidos_enc, self.conhecidos_nom)
+
+    def processar(self, d_ini, d_fim, tol):
+        """Roda o pipeline completo. Retorna a lista de registros (ou None se não houve o que processar)."""
+        self.metricas = MetricasExecucao()
+        dados = None
+        try:
+            dados = self._processar(d_ini, d_fim, tol)
+            return dados
+        finally:
+            # Com registros, salvar_dados grava as métricas; sem eles (erro no ZIP/chat, sem correspondência,
+            # exceção) a execução termina aqui e as métricas são gravadas agora
+            if dados is None: self.finalizar_metricas()
+
+    def _processar(self, d_ini, d_fim, tol):
+        try:
+            with self.metricas.etapa('zip'): pasta_temp, caminho_txt, todos_arquivos = self.preparing_arquivos()
+        except Exception as e: self.queue.put({'acao': 'msg_erro', 'texto': str(e)}); return None
+        # Estatísticas novas a cada execução: a cascata se ajusta ao perfil deste export
+        try: self.cascata = CascataDeteccao.da_config(self.config)
+        except ValueError as e: self.queue.put({'acao': 'msg_erro', 'texto': str(e)}); return None
+        self.queue.put({'acao': 'log', 'texto': f"--- Iniciando {d_ini} a {d_fim} ---"})
+        with self.metricas.etapa('chat'): lista_horarios = self.obter_horarios_validos(caminho_txt, d_ini, d_fim)
+        with self.metricas.etapa('pareamento'): pares = self.parear_midias(lista_horarios, todos_arquivos)
+        if not pares: self.queue.put({'acao': 'msg_fim', 'texto': "Sem correspondência."}); return None
+        fila_para_reconhecer = []; pular = 0
+        for arq, hr in pares:
+            if nome_midia(arq).lower().endswith(('.jpg', '.jpeg', '.png')): fila_para_reconhecer.append({'caminho': arq, 'data': hr['data'], 'hora': hr['hora'], 'remetente': hr.get('remetente')})
+            else: pular += 1
+        self.queue.put({'acao': 'log', 'texto': f"ℹ️ Sincronia: {len(pares)} mídias no período, {len(todos_arquivos) - len(pares)} fora dele (não lidas), {pular} não-foto ignoradas."})
+        self.metricas.contar('midias_no_periodo', len(pares)); self.metricas.contar('fotos', len(fila_para_reconhecer))
+        with self.metricas.etapa('galeria'): self.carregar_galeria()
+        dados = []; resultados = [None] * len(fila_para_reconhecer); manuais = set()
+
+        # Fotos já vistas em execuções anteriores (mesmo conteúdo): nada de detecção/encoding de novo.
+        # Rótulos corrigidos à mão são reaproveitados; os demais são recomparados com a galeria atual.
+        inicio_etapa = time.perf_counter()
+        for item in fila_para_reconhecer:
+            try: item['hash'] = hash_midia(item['caminho'])
+            except Exception: item['hash'] = None
+        try: conhecidas = self.banco.obter_midias({item['hash'] for item in fila_para_reconhecer if item['hash']})
+        except sqlite3.Error as e: log_debug(f"Erro ao consultar mídias processadas: {e}"); conhecidas = {}
+        pendentes = []
+        for idx, item in enumerate(fila_para_reconhecer):
+            m = conhecidas.get(item['hash'])
+            if m is None: pendentes.append(idx)
+            # Um nome por rosto (foto sem rosto: o único "Desconhecido", que pode ter sido nomeado à mão)
+            elif m['manual']: resultados[idx] = [(n, None, None) for n in m['nomes'][:max(1, len(m['encodings']))]]; manuais.add(idx)
+            elif len(m['encodings']): resultados[idx] = self.galeria.comparar(m['encodings'], tol)
+            else: resultados[idx] = [("Desconhecido", None, None)]
+        self.metricas.adicionar_tempo('midias_conhecidas', time.perf_counter() - inicio_etapa)
+        self.metricas.contar('reaproveitadas', len(fila_para_reconhecer) - len(pendentes))
+        if conhecidas: self.queue.put({'acao': 'log', 'texto': f"♻️ {len(fila_para_reconhecer) - len(pendentes)} fotos já processadas antes foram reaproveitadas."})
+
+        # Selfies reenviadas/recomprimidas: agrupadas pelo hash perceptual, só a primeira de cada grupo passa pela cascata
+        with self.metricas.etapa('hash_perceptual'):
+            hashes_p = []
+            for i in pendentes:
+                try: hashes_p.append(hash_perceptual(fila_para_reconhecer[i]['caminho']))
+                except Exception: hashes_p.append(None)
+            grupo_de = agrupar_duplicatas(hashes_p)
+        representantes = [i for j, i in enumerate(pendentes) if grupo_de[j] == j]
+        copias = {}
+        for j, r in enumerate(grupo_de):
+            if r != j: copias.setdefault(pendentes[r], []).append(pendentes[j])
+        for rep, lista_copias in copias.items():
+            for i in [rep] + lista_copias: fila_para_reconhecer[i]['grupo'] = rep
+        self.metricas.contar('copias', len(pendentes) - len(representantes))
+        if copias: self.log(f"🪞 {len(pendentes) - len(representantes)} fotos repetidas (reenvios/cópias) seguem o resultado da original.")
+
+        total = len(representantes)
+        self.queue.put({'acao': 'config_max', 'valor': total})
+        self.queue.put({'acao': 'log', 'texto': f"🚀 Analisando {total} fotos..."})
+        start = time.time()
+        n_proc = max(1, int(self.config.get('processos', 1)))
+        caminhos = [fila_para_reconhecer[i]['caminho'] for i in representantes]
+        if n_proc > 1 and total > 1:
+            self.queue.put({'acao': 'log', 'texto': f"⚙️ Modo paralelo: {n_proc} processos."})
+            resultados_iter = self.reconhecer_paralelo(caminhos, tol, n_proc)
+        else: resultados_iter = self.reconhecer_sequencial(caminhos, tol)
+        # Os resultados podem chegar fora de ordem; guardamos pelo índice para manter o par data/hora
+        novas_midias = []
+        for feitos, (j, matches, encs, registro) in enumerate(resultados_iter, 1):
+            self.metricas.registrar_foto(registro, matches, encs)
+            elapsed = time.time() - start
+            est = f"Restam {divmod(int((elapsed/feitos)*(total-feitos)), 60)[0]}m"
+            self.queue.put({'acao': 'progresso', 'valor': feitos, 'max': total, 'estimativa': est, 'status': f"Processando {feitos}/{total}"})
+            grupo = [representantes[j]] + copias.get(representantes[j], [])
+            for i in grupo: resultados[i] = matches
+            if matches is None: self.queue.put({'acao': 'log', 'texto': f"❌ Erro foto"}); continue
+            # "Sem rosto" só vai para o registro de mídias se a cascata inteira rodou; com etapas puladas ou
+            # cortadas pelo orçamento, a foto é detectada de novo na próxima execução
+            completa = encs or not (registro['puladas'] or registro['estouro'])
+            for i in grupo:
+                item = fila_para_reconhecer[i]
+                if item['hash'] and completa: novas_midias.append((item['hash'], nome_midia(item['caminho']), item['data'], item['hora'], encs, [m[0] for m in matches]))
+            for n, dist, margem in matches:
+                conf = f" (d={dist:.2f}, margem={margem:.2f})" if dist is not None and n != "Desconhecido" else ""
+                self.queue.put({'acao': 'log', 'texto': f"✅ {n}{conf}"})
+        self.metricas.adicionar_tempo('reconhecimento', time.time() - start)
+        if self.cascata.fotos:
+            for linha in self.cascata.relatorio(): self.log(f"📊 {linha}")
+        try: self.banco.registrar_midias(novas_midias)
+        except sqlite3.Error as e: log_debug(f"Erro ao registrar mídias processadas: {e}")
+        for idx, (item, matches) in enumerate(zip(fila_para_reconhecer, resultados)):
+            if not matches: continue
+            p = item['caminho']
+            for rosto, (n, dist, margem) in enumerate(matches):
+                dados.append({'nome': n, 'data': item['data'], 'hora': item['hora'], 'caminho_completo': p, 'arquivo_origem': nome_midia(p), 'distancia': dist, 'hash_arquivo': item['hash'], 'manual': idx in manuais, 'remetente': item.get('remetente'), 'grupo': item.get('grupo'), 'rosto': rosto})
+        self.metricas.contar('registros', len(dados)); self.metricas.contar('desconhecidos', sum(1 for d in dados if d['nome'] == "Desconhecido"))
+        self.queue.put({'acao': 'metricas', 'linhas': self.metricas.linhas()})
+        return dados
+
+    def reconhecer_sequencial(self, caminhos, tol):
+        for idx, p in enumerate(caminhos):
+            if self.parar_execucao: break
+            try: matches, encs, registro = reconhecer_foto(p, self.galeria, tol, self.cascata)
+            except Exception: matches = encs = registro = None
+            yield idx, matches, encs, registro
+
+    def reconhecer_paralelo(self, caminhos, tol, n_proc):
+        executor = ProcessPoolExecutor(max_workers=n_proc, initializer=_iniciar_worker,
+                                       initargs=(self.conhecidos_enc, self.conhecidos_nom, tol, self.cascata.etapas, self.cascata.orcamento))
+        try:
+            futuros = [executor.submit(_reconhecer_no_worker, idx, p) for idx, p in enumerate(caminhos)]
+            for fut in as_completed(futuros):
+                if self.parar_execucao: break
+                idx, matches, encs, registro = fut.result()
+                # Cada processo ajusta a própria cascata; aqui só se somam os números para o relatório
+                if registro: self.cascata.acumular(registro)
+                yield idx, matches, encs, registro
+        finally:
+            executor.shutdown(wait=not self.parar_execucao, cancel_futures=True)
+
+    def gerar_pdf(self, filepath, data):
+        """Relatório executivo: resumo do banco de horas e o extrato diário de cada funcionário.
+        `data` são batidas consolidadas (nome/data/hora) ou linhas de relatório (Nome/Data/Entrada/Saída).
+        A agregação é feita uma vez, em colunas; o cabeçalho das tabelas é um form desenhado uma vez e só
+        referenciado em cada página, e o texto de cada página vai num único objeto de texto."""
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        from reportlab.lib import colors
+        c = canvas.Canvas(filepath, pagesize=A4)
+        w, h = A4
+        if not data:
+            c.drawString(50, h - 50, "Nenhum dado para gerar o relatório.")
+            c.save()
+            return
+
+        # Linhas de relatório (Entrada/Saída) ou batidas consolidadas; '--:--' não vira batida
+        colunas = BatidasColunares.de_relatorio(data) if 'Entrada' in data[0] else BatidasColunares.de_registros(data)
+        cod_dia, dias, primeiras, ultimas, _ = colunas.por_dia()
+        saldos = colunas.saldos()
+        presentes = np.unique(cod_dia)
+        dias_unicos, idx_dia = np.unique(dias, return_inverse=True)
+        datas_txt = [f"{d.day:02d}/{d.month:02d}/{d.year}" for d in dias_unicos.astype(object)]
+        # por_dia já vem ordenado por funcionário e dia: o extrato de cada um é uma fatia contígua
+        limites = np.searchsorted(cod_dia, np.append(presentes, len(colunas.nomes))).tolist()
+
+        # --- Forms com o cabeçalho das tabelas (desenhados em y=0 e posicionados com translate) ---
+        c.beginForm("cabecalho_resumo")
+        c.setFillColor(colors.black)
+        c.rect(50, 0, 495, 25, fill=True, stroke=False)
+        c.setFillColor(colors.white)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(60, 8, "FUNCIONÁRIO")
+        c.drawString(400, 8, "SALDO TOTAL")
+        c.endForm()
+        c.beginForm("cabecalho_extrato")
+        c.setFillColor(colors.lightgrey)
+        c.rect(50, 0, 495, 15, fill=True, stroke=False)
+        c.setFillColor(colors.black)
+        c.setFont("Helvetica-Bold", 9)
+        for x, rotulo in ((55, "DATA"), (130, "ENTRADA"), (200, "SAÍDA"), (270, "STATUS")): c.drawString(x, 4, rotulo)
+        c.endForm()
+
+        def usar_form(nome, y):
+            c.saveState(); c.translate(0, y); c.doForm(nome); c.restoreState()
+
+        def fmt_delta(minutos):
+            sign = "+" if minutos >= 0 else "-"
+            minutos = abs(minutos)
+            return f"{sign}{minutos // 60:02d}:{minutos % 60:02d}"
+
+        # --- Resumo: uma linha por funcionário, com o cabeçalho repetido se passar de uma página ---
+        c.setFont("Helvetica-Bold", 18)
+        c.drawString(50, h - 50, "Relatório Executivo de Ponto")
+        y = h - 90
+        usar_form("cabecalho_resumo", y)
+        y -= 30
+        texto = c.beginText(); separadores = []
+        for cod in presentes.tolist():
+            if y < 50:
+                c.drawText(texto); c.setStrokeColor(colors.lightgrey); c.lines(separadores)
+                c.showPage()
+                y = h - 50
+                usar_form("cabecalho_resumo", y)
+                y -= 30
+                texto = c.beginText(); separadores = []
+            saldo = int(saldos[cod])
+            texto.setFillColor(colors.black); texto.setFont("Helvetica", 11)
+            texto.setTextOrigin(60, y); texto.textOut(colunas.nomes[cod])
+            texto.setFillColor(colors.green if saldo >= 0 else colors.red); texto.setFont("Helvetica-Bold", 11)
+            texto.setTextOrigin(400, y); texto.textOut(fmt_delta(saldo))
+            separadores.append((50, y - 5, 545, y - 5))
+            y -= 25
+        c.drawText(texto); c.setStrokeColor(colors.lightgrey); c.lines(separadores)
+        c.showPage()
+
+        # --- Extratos: o texto de cada página acumula num objeto só, desenhado ao virar a página ---
+        y = h - 50
+        texto = c.beginText(); texto.setFont("Helvetica", 10); cor_atual = None
+
+        def virar_pagina():
+            nonlocal texto, cor_atual
+            c.drawText(texto)
+            c.showPage()
+            texto = c.beginText(); texto.setFont("Helvetica", 10); cor_atual = None
+            return h - 50
+
+        for i, cod in enumerate(presentes.tolist()):
+            if y < 150: y = virar_pagina()
+            c.setFillColor(colors.darkblue)
+            c.setFont("Helvetica-Bold", 14)
+            c.drawString(50, y, f"Extrato: {colunas.nomes[cod]}")
+            y -= 25
+            usar_form("cabecalho_extrato", y)
+            y -= 20
+            fatia = slice(limites[i], limites[i + 1])
+            for d, p, u in zip(idx_dia[fatia].tolist(), primeiras[fatia].tolist(), ultimas[fatia].tolist()):
+                incompleto = p == u
+                if cor_atual is not colors.black: texto.setFillColor(colors.black); cor_atual = colors.black
+                texto.setTextOrigin(55, y); texto.textOut(datas_txt[d])
+                texto.setTextOrigin(130, y); texto.textOut(HORAS_TEXTO[p])
+                texto.setTextOrigin(200, y); texto.textOut("--:--" if incompleto else HORAS_TEXTO[u])
+                cor = colors.orange if incompleto else colors.black
+                if cor is not cor_atual: texto.setFillColor(cor); cor_atual = cor
+                texto.setTextOrigin(270, y); texto.textOut("Ponto Incompleto" if incompleto else "OK")
+                y -= 15
+                if y < 50: y = virar_pagina()
+            y -= 30
+        if cor_atual is not None: c.drawText(texto)
+        c.save()
+
+# --- LINHA DE COMANDO ---
+SAIDA_OK = 0
+SAIDA_ERRO = 1
+SAIDA_SEM_DADOS = 3
+SAIDA_ERRO_SHEETS = 4
+
+class FilaConsole:
+    """Substitui a fila da interface: imprime os logs e o progresso no terminal."""
+    def __init__(self):
+        self.erro = None
+
+    def put(self, task):
+        acao = task.get('acao')
+        if acao == 'log': log_debug(task['texto'])
+        elif acao == 'progresso':
+            if task['valor'] == task['max'] or task['valor'] % 50 == 0: log_debug(f"{task['status']} - {task['estimativa']}")
+        elif acao == 'msg_erro': self.erro = task['texto']; log_debug(f"ERRO: {task['texto']}")
+        elif acao == 'msg_fim': log_debug(task['texto'])
+
+def _data_cli(texto):
+    try: return datetime.datetime.strptime(texto, "%d/%m/%Y").date()
+    except ValueError: raise argparse.ArgumentTypeError(f"data inválida '{texto}' (use dd/mm/aaaa)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Processa um ZIP exportado do WhatsApp e gera os registros de ponto sem abrir a interface.",
+        epilog=f"Códigos de saída: {SAIDA_OK}=ok, {SAIDA_ERRO}=erro, {SAIDA_SEM_DADOS}=nenhuma foto no período, {SAIDA_ERRO_SHEETS}=falha no Google Sheets."
+    )
+    parser.add_argument("zip", help="Arquivo ZIP exportado do WhatsApp")
+    parser.add_argument("--inicio", type=_data_cli, required=True, help="Data inicial (dd/mm/aaaa)")
+    parser.add_argument("--fim", type=_data_cli, required=True, help="Data final (dd/mm/aaaa)")
+    parser.add_argument("--tolerancia", type=float, default=0.45, help="Distância máxima para reconhecer um rosto (padrão: 0.45)")
+    parser.add_argument("--funcionarios", default="funcionarios", help="Pasta com as fotos de referência")
+    parser.add_argument("--processos", type=int, default=1, help="Número de processos de reconhecimento")
+    parser.add_argument("--cascata", default=",".join(CASCATA_PADRAO), help=f"Etapas de detecção, em ordem (disponíveis: {', '.join(ETAPAS_DETECCAO)})")
+    parser.add_argument("--orcamento-foto", type=float, default=0, help="Segundos máximos de detecção por foto (0 = sem limite)")
+    parser.add_argument("--saida", default="registros.csv", help="CSV com os registros reconhecidos")
+    parser.add_argument("--pdf", default="relatorio.pdf", help="Relatório PDF gerado ao final")
+    parser.add_argument("--sem-sheets", action="store_true", help="Não envia os registros para o Google Sheets")
+    parser.add_argument("--planilha-local", metavar="CSV", help="Envia para um CSV local no lugar do Google Sheets (testes)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(filename='log_debug.txt', level=logging.DEBUG, format='%(asctime)s - %(message)s', filemode='w')
+    if not os.path.exists(args.zip): log_debug(f"ZIP não encontrado: {args.zip}"); return SAIDA_ERRO
+
+    fila = FilaConsole()
+    planilha = PlanilhaLocal(args.planilha_local) if args.planilha_local else None
+    motor = MotorPonto(args.funcionarios, {'processos': args.processos, 'cascata': args.cascata.split(","), 'orcamento_foto': args.orcamento_foto}, fila, planilha)
+    motor.caminho_zip = args.zip
+    try:
+        dados = motor.processar(args.inicio, args.fim, args.tolerancia)
+        if fila.erro: return SAIDA_ERRO
+        if not dados:
+            # Lista vazia não passa por salvar_dados (None já gravou as métricas em processar)
+            if dados is not None: motor.finalizar_metricas()
+            return SAIDA_SEM_DADOS
+
+        with open(args.saida, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["nome", "data", "hora", "arquivo", "distancia"])
+            for d in dados: writer.writerow([d['nome'], d['data'], d['hora'], d['arquivo_origem'], "" if d['distancia'] is None else f"{d['distancia']:.4f}"])
+        log_debug(f"📄 {len(dados)} registros salvos em {args.saida}")
+        motor.gerar_pdf(args.pdf, dados)
+        log_debug(f"📄 PDF salvo em {args.pdf}")
+
+        if args.sem_sheets:
+            motor.registrar_batidas(dados)
+            motor.finalizar_metricas()
+            return SAIDA_OK
+        return SAIDA_OK if motor.salvar_dados(dados) else SAIDA_ERRO_SHEETS
+    except Exception as e:
+        log_debug(f"ERRO: {e}"); logging.error(traceback.format_exc())
+        return SAIDA_ERRO
+    finally:
+        fechar_zips()
+        if motor.temp_dir and os.path.exists(motor.temp_dir): shutil.rmtree(motor.temp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,12 +4,8 @@ from tkinter import filedialog, messagebox, simpledialog
 from tkinterdnd2 import DND_FILES, TkinterDnD
 from tkcalendar import DateEntry
 from PIL import Image, ImageTk
-import face_recognition
 import os
 import datetime
-from datetime import timedelta
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import time
 import re
 import io
@@ -17,34 +13,51 @@ import threading
 import queue
 import traceback
 import logging
-import zipfile
 import shutil
-import tempfile
-import numpy as np
 import json
 import subprocess
 import sys
-from collections import defaultdict
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-import csv
-from openpyxl import Workbook
-from cairosvg import svg2png
+import hashlib
+import unicodedata
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from motor_ponto import MotorPonto, MidiaZip, abrir_midia, aquecer_modelos, log_debug, agregar_relatorio, exportar_relatorio_csv, exportar_relatorio_excel
 
 # --- FUNÇÃO PARA CARREGAR ÍCONES ---
-def load_icon(name, theme):
+PASTA_ASSETS = "assets"
+PASTA_CACHE_ICONES = os.path.join(PASTA_ASSETS, ".cache")
+_cache_icones = {}
+
+def load_icon(name, theme, size=24):
     color = THEMES[theme]["COLOR_TEXT_MAIN"]
+    chave = (name, color, size)
+    if chave in _cache_icones: return _cache_icones[chave]
     try:
-        with open(f"assets/{name}.svg", "r") as f:
-            svg_data = f.read()
+        svg_path = os.path.join(PASTA_ASSETS, f"{name}.svg")
+        png_path = os.path.join(PASTA_CACHE_ICONES, f"{name}_{color.lstrip('#')}_{size}.png")
 
-        # Substitui a cor do ícone
-        svg_data = svg_data.replace('stroke="currentColor"', f'stroke="{color}"')
+        # O PNG em disco só vale se for mais novo que o SVG de origem
+        if os.path.exists(png_path) and os.path.getmtime(png_path) >= os.path.getmtime(svg_path):
+            pil = Image.open(png_path); pil.load()
+        else:
+            from cairosvg import svg2png
+            with open(svg_path, "r") as f:
+                svg_data = f.read()
 
-        png_data = svg2png(bytestring=svg_data.encode('utf-8'))
+            # Substitui a cor do ícone
+            svg_data = svg_data.replace('stroke="currentColor"', f'stroke="{color}"')
 
-        return ctk.CTkImage(Image.open(io.BytesIO(png_data)), size=(24, 24))
+            png_data = svg2png(bytestring=svg_data.encode('utf-8'), output_width=size, output_height=size)
+            pil = Image.open(io.BytesIO(png_data)); pil.load()
+            try:
+                os.makedirs(PASTA_CACHE_ICONES, exist_ok=True)
+                tmp = png_path + ".tmp"
+                with open(tmp, "wb") as f: f.write(png_data)
+                os.replace(tmp, png_path)
+            except OSError as e: log_debug(f"Não foi possível gravar o cache do ícone {name}: {e}")
+
+        _cache_icones[chave] = ctk.CTkImage(pil, size=(size, size))
+        return _cache_icones[chave]
     except Exception as e:
         log_debug(f"Erro ao carregar ícone {name}: {e}")
         return None
@@ -75,16 +88,127 @@ THEMES = {
     }
 }
 
-# LOG
-logging.basicConfig(filename='log_debug.txt', level=logging.DEBUG, format='%(asctime)s - %(message)s', filemode='w')
-
-def log_debug(msg):
-    print(msg)
-    logging.info(msg)
-
-NOME_PLANILHA_GOOGLE = "PontoFuncionarios"
 ARQUIVO_CONFIG = "config.json"
 ARQUIVO_FUNCIONARIOS = "funcionarios.json"
+PASTA_CACHE_MINIATURAS = "cache_miniaturas"
+LOTE_CARDS = 40 # Cards criados por vez na aba Funcionários; mais são criados ao rolar até o fim
+ATRASO_FILTRO_MS = 250 # Espera após a última tecla antes de refiltrar a lista
+INTERVALO_FILA_MS = 100 # Ritmo em que a interface aplica as mensagens do motor (progresso e log)
+LIMITE_LINHAS_LOG = 2000 # Linhas mantidas na caixa de log; o log completo vai para o arquivo
+
+# --- PREVIEW DO RELATÓRIO ---
+def texto_preview_relatorio(linhas):
+    """Texto inteiro do preview (cabeçalho + uma linha por dia), para um único insert no CTkTextbox."""
+    partes = [f"{'Nome':<20} {'Data':<12} {'Entrada':<10} {'Saída':<10}\n", "-" * 60 + "\n"]
+    partes += [f"{l['Nome']:<20} {l['Data']:<12} {l['Entrada']:<10} {l['Saída']:<10}\n" for l in linhas]
+    return "".join(partes)
+
+# --- ÍNDICE DE BUSCA DOS FUNCIONÁRIOS ---
+def normalizar_texto(texto):
+    """Minúsculas e sem acentos ("João" -> "joao")."""
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c)).lower().strip()
+
+class IndiceFuncionarios:
+    """Índice dos funcionários ativos com nome normalizado e admissão/salário já convertidos.
+    Mantém uma ordem pré-calculada por campo, então filtrar não exige reordenar nem reconverter nada."""
+    CAMPOS = ("Nome", "Data de Admissão", "Salário")
+
+    def __init__(self):
+        self.entradas = {}
+        self.ordens = {campo: [] for campo in self.CAMPOS}
+
+    @staticmethod
+    def _indexar(f, assinatura):
+        try: admissao = datetime.datetime.strptime(f.get("admissao", "01/01/1900"), '%d/%m/%Y')
+        except (ValueError, TypeError): admissao = datetime.datetime.min
+        try: salario = float(str(f.get("salario", "0")).replace(',', '.'))
+        except ValueError: salario = 0.0
+        nome_norm = normalizar_texto(f['nome'])
+        return {
+            'assinatura': assinatura,
+            'nome_norm': nome_norm,
+            'chaves': {"Nome": nome_norm, "Data de Admissão": admissao, "Salário": salario}
+        }
+
+    def atualizar(self, funcionarios):
+        """Reindexa só os registros novos ou alterados (nome, admissão ou salário)."""
+        novas = {}
+        for f in funcionarios:
+            if f.get('status', 'ativo') != 'ativo': continue
+            assinatura = (f['nome'], f.get('admissao'), f.get('salario'))
+            ent = self.entradas.get(f['id'])
+            if ent is None or ent['assinatura'] != assinatura: ent = self._indexar(f, assinatura)
+            ent['func'] = f
+            novas[f['id']] = ent
+        self.entradas = novas
+        for campo in self.CAMPOS:
+            self.ordens[campo] = sorted(novas.values(), key=lambda e, c=campo: e['chaves'][c])
+
+    def buscar(self, texto, campo="Nome", decrescente=False):
+        termos = normalizar_texto(texto).split()
+        ordem = self.ordens.get(campo, self.ordens["Nome"])
+        if decrescente: ordem = reversed(ordem)
+        return [e['func'] for e in ordem if all(t in e['nome_norm'] for t in termos)]
+
+# --- CACHE DE MINIATURAS ---
+class CacheMiniaturas:
+    """Miniaturas das fotos dos funcionários: LRU em memória + PNGs em disco (chave: arquivo + mtime + tamanho).
+    As miniaturas que faltam são geradas fora da thread do Tk e entregues via fila ({'acao': 'miniatura'})."""
+    def __init__(self, fila, pasta=PASTA_CACHE_MINIATURAS, capacidade=512):
+        self.fila = fila
+        self.pasta = pasta
+        self.capacidade = capacidade
+        self.memoria = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def _chave(self, path, tamanho):
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_mtime_ns, tamanho)
+
+    def _da_memoria(self, chave):
+        with self.lock:
+            pil = self.memoria.get(chave)
+            if pil is not None: self.memoria.move_to_end(chave)
+            return pil
+
+    def _para_memoria(self, chave, pil):
+        with self.lock:
+            self.memoria[chave] = pil
+            self.memoria.move_to_end(chave)
+            while len(self.memoria) > self.capacidade: self.memoria.popitem(last=False)
+
+    def _gerar(self, path, tamanho, chave):
+        disco = os.path.join(self.pasta, hashlib.sha1(repr(chave).encode('utf-8')).hexdigest() + ".png")
+        if os.path.exists(disco):
+            pil = Image.open(disco); pil.load()
+            return pil
+        with Image.open(path) as im:
+            im.draft('RGB', tamanho) # JPEG: decodifica direto em resolução reduzida
+            im.thumbnail(tamanho)
+            pil = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            pil.save(disco + ".tmp", format="PNG"); os.replace(disco + ".tmp", disco)
+        except OSError as e: log_debug(f"Não foi possível gravar miniatura de {path}: {e}")
+        return pil
+
+    def _tarefa(self, path, tamanho, chave, callback):
+        try:
+            pil = self._gerar(path, tamanho, chave)
+            self._para_memoria(chave, pil)
+        except Exception as e:
+            log_debug(f"Erro ao gerar miniatura de {path}: {e}"); pil = None
+        self.fila.put({'acao': 'miniatura', 'callback': callback, 'imagem': pil})
+
+    def solicitar(self, path, tamanho, callback):
+        """Chama callback(pil) na thread do Tk: na hora se já estiver em memória, senão quando ficar pronta.
+        callback(None) indica que a imagem não pôde ser carregada."""
+        try: chave = self._chave(path, tamanho)
+        except OSError: callback(None); return
+        pil = self._da_memoria(chave)
+        if pil is not None: callback(pil); return
+        self.executor.submit(self._tarefa, path, tamanho, chave, callback)
 
 # --- JANELA DE SELEÇÃO DE MÚLTIPLOS FUNCIONÁRIOS ---
 class ToplevelSelecaoFuncionarios(ctk.CTkToplevel):
@@ -273,15 +397,17 @@ class ToplevelWindowFuncionario(ctk.CTkToplevel):
             self._carregar_imagem(path)
 
     def _carregar_imagem(self, path):
-        try:
-            pil_image = Image.open(path)
-            h, w = pil_image.height, pil_image.width
-            ratio = min(180/w, 180/h)
-
-            ctk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(int(w*ratio), int(h*ratio)))
-            self.lbl_foto_preview.configure(image=ctk_image, text="")
-        except Exception as e:
-            messagebox.showerror("Erro ao carregar imagem", str(e), parent=self)
+        self.lbl_foto_preview.configure(image=None, text="⏳")
+        self.master.miniaturas.solicitar(path, (180, 180), self._mostrar_imagem)
+
+    def _mostrar_imagem(self, pil_image):
+        if not self.winfo_exists(): return
+        if pil_image is None:
+            self.lbl_foto_preview.configure(image=None, text="👤")
+            messagebox.showerror("Erro ao carregar imagem", "Não foi possível abrir a imagem selecionada.", parent=self)
+            return
+        ctk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=pil_image.size)
+        self.lbl_foto_preview.configure(image=ctk_image, text="")
 
     def toggle_dados_extras(self):
         self.dados_extras_visiveis = not self.dados_extras_visiveis
@@ -313,7 +439,9 @@ class ToplevelWindowFuncionario(ctk.CTkToplevel):
             if self.photo_path:
                 nome_limpo = re.sub(r'[^a-zA-Z0-9]', '', nome)
                 novo_nome_foto = f"{nome_limpo}_{int(time.time())}.jpg"
-                shutil.copy(self.photo_path, os.path.join(self.master.pasta_funcionarios, novo_nome_foto))
+                destino = os.path.join(self.master.pasta_funcionarios, novo_nome_foto)
+                shutil.copy(self.photo_path, destino)
+                self.master.motor.cache_encodings.invalidar(destino)
 
             if self.funcionario_data is None: # Novo Cadastro
                 if not self.photo_path:
@@ -333,7 +461,9 @@ class ToplevelWindowFuncionario(ctk.CTkToplevel):
                     "fotos": [novo_nome_foto]
                 }
                 self.master.dados_funcionarios.append(novo_funcionario)
+                alterado = novo_funcionario
             else: # Edição
+                alterado = None
                 for func in self.master.dados_funcionarios:
                     if func['id'] == self.funcionario_data['id']:
                         func['nome'] = nome
@@ -345,9 +475,10 @@ class ToplevelWindowFuncionario(ctk.CTkToplevel):
                         func['carteira_trabalho'] = self.entry_ctps.get()
                         if novo_nome_foto:
                             func['fotos'].append(novo_nome_foto)
+                        alterado = func
                         break
 
-            self.master.salvar_dados_funcionarios()
+            if alterado: self.master.salvar_funcionario(alterado)
             self.master.carregar_lista_funcionarios()
             self.destroy()
 
@@ -376,18 +507,20 @@ class AppPonto(ctk.CTk, TkinterDnD.DnDWrapper):
             pass
 
         self.config = self.load_config()
-        self.parar_execucao = False
         self.queue = queue.Queue()
-        self.after(100, self.verificar_fila)
+        self.after(INTERVALO_FILA_MS, self.verificar_fila)
 
-        self.temp_dir = None
         self.pasta_funcionarios = "funcionarios"
         if not os.path.exists(self.pasta_funcionarios): os.makedirs(self.pasta_funcionarios)
+        self.motor = MotorPonto(self.pasta_funcionarios, self.config, self.queue)
+        self.miniaturas = CacheMiniaturas(self.queue)
 
+        self.indice_funcionarios = IndiceFuncionarios()
         self.dados_funcionarios = []
         self.carregar_dados_funcionarios()
 
         self.historico_relatorios = []
+        self.cancelar_relatorio = None # Event da geração de relatório em andamento
         self.dados_consolidados = []
         self.caminho_zip = ""
         self.conhecidos_nom = []
@@ -448,6 +581,13 @@ class AppPonto(ctk.CTk, TkinterDnD.DnDWrapper):
         self.select_frame_by_name("Processamento")
         self._apply_theme()
 
+        # Carrega os modelos do dlib em segundo plano depois que a janela aparece
+        self.after(500, lambda: threading.Thread(target=aquecer_modelos, daemon=True).start())
+
+        # Reenvia o que ficou pendente para o Google Sheets em execuções anteriores
+        if self.motor.saida_sheets.pendentes():
+            self.motor.saida_sheets.drenar_em_segundo_plano(log=self.motor.log)
+
 # ===================================================================
 # --- CLASSES DAS ABAS ---
 # ===================================================================
@@ -548,6 +688,14 @@ class AbaProcessamento(ctk.CTkFrame):
         self.app.txt_log.grid(row=1, column=0, sticky="nsew", pady=(15,0))
         self.app.txt_log.configure(state="disabled")
 
+        # Métricas da última execução (também gravadas em metricas/*.json e *.prom)
+        self.card_metricas = ctk.CTkFrame(self.frame_right, corner_radius=15, border_width=1)
+        self.card_metricas.grid(row=2, column=0, sticky="ew", pady=(15, 0))
+        self.lbl_metricas_title = ctk.CTkLabel(self.card_metricas, text="MÉTRICAS DA EXECUÇÃO", font=("Arial", 11, "bold"))
+        self.lbl_metricas_title.pack(anchor="w", padx=20, pady=(15, 5))
+        self.app.lbl_metricas = ctk.CTkLabel(self.card_metricas, text="Nenhuma execução ainda.", font=("Consolas", 11), justify="left")
+        self.app.lbl_metricas.pack(anchor="w", padx=20, pady=(0, 15))
+
         self.app.btn_parar = ctk.CTkButton(self.app.header, text="PARAR", width=80, state="disabled", command=self.app.solicitar_parada)
 
 class AbaFuncionarios(ctk.CTkFrame):
@@ -573,7 +721,7 @@ class AbaFuncionarios(ctk.CTkFrame):
         self.lbl_filter_name.pack(side="left", padx=(15, 5))
         self.app.filtro_nome = ctk.CTkEntry(self.filter_frame, placeholder_text="Digite um nome...")
         self.app.filtro_nome.pack(side="left", padx=5, fill="x", expand=True)
-        self.app.filtro_nome.bind("<KeyRelease>", lambda e: self.app.carregar_lista_funcionarios())
+        self.app.filtro_nome.bind("<KeyRelease>", self.app.agendar_filtro)
 
         self.lbl_sort_by = ctk.CTkLabel(self.filter_frame, text="Ordenar por:")
         self.lbl_sort_by.pack(side="left", padx=(15, 5))
@@ -588,6 +736,23 @@ class AbaFuncionarios(ctk.CTkFrame):
         self.app.scroll_func = ctk.CTkScrollableFrame(self, fg_color="transparent")
         self.app.scroll_func.pack(fill="both", expand=True, padx=10, pady=5)
 
+        # Estado da lista incremental: cards já criados (por id), ordem atual e quantos exibir
+        self.app.cards_funcionarios = {}
+        self.app.ordem_cards = []
+        self.app.limite_cards = LOTE_CARDS
+        self.app.criterio_lista = None
+        self.app.funcionarios_visiveis = []
+        self.app.lbl_lista_vazia = None
+
+        # Cria o próximo lote de cards quando a rolagem chega perto do fim
+        canvas = getattr(self.app.scroll_func, "_parent_canvas", None)
+        scrollbar = getattr(self.app.scroll_func, "_scrollbar", None)
+        if canvas is not None and scrollbar is not None:
+            def on_scroll(inicio, fim):
+                scrollbar.set(inicio, fim)
+                if float(fim) > 0.9: self.app.renderizar_mais_cards()
+            canvas.configure(yscrollcommand=on_scroll)
+
         self.app.carregar_lista_funcionarios()
 
 class AbaRelatorios(ctk.CTkFrame):
@@ -690,78 +855,72 @@ class AbaRelatorios(ctk.CTkFrame):
         self.combo_funcionarios.configure(values=["Todos"] + nomes_ativos + ["Personalizar..."])
 
     def gerar_relatorio(self):
+        # Consulta e agregação rodam numa thread; o botão vira "Cancelar" enquanto isso. Cancelar interrompe a consulta
+        # no SQLite e libera a tela na hora: o resultado que ainda chegar da thread é descartado em concluir_relatorio
+        if self.cancelar_relatorio is not None:
+            self.cancelar_relatorio.set(); self.cancelar_relatorio = None
+            self.frames["Relatorios"].btn_gerar_relatorio.configure(text="Gerar Relatório")
+            self.txt_relatorio.configure(state="normal")
+            self.txt_relatorio.delete("1.0", "end")
+            self.txt_relatorio.insert("end", "Geração do relatório cancelada.\n")
+            self.txt_relatorio.configure(state="disabled")
+            return
         self.txt_relatorio.configure(state="normal")
         self.txt_relatorio.delete("1.0", "end")
 
-        if not self.dados_consolidados:
+        if not self.dados_consolidados and not self.motor.banco.tem_batidas():
             self.txt_relatorio.insert("end", "Nenhum dado processado para gerar relatório.\nPor favor, processe um arquivo ZIP primeiro na aba 'Processamento'.")
             self.txt_relatorio.configure(state="disabled")
             return
 
         self.txt_relatorio.insert("end", "Gerando relatório...\n")
+        self.txt_relatorio.configure(state="disabled")
 
         data_inicio = self.cal_relatorio_inicio.get_date()
         data_fim = self.cal_relatorio_fim.get_date()
+        # Consulta o histórico no banco local (todas as execuções já salvas, não só a atual)
+        nomes = None if "Todos" in self.funcionarios_selecionados else list(self.funcionarios_selecionados)
+        nome_relatorio = self.combo_funcionarios.get()
+        if len(self.funcionarios_selecionados) > 1: nome_relatorio = f"{len(self.funcionarios_selecionados)} funcionários"
 
-        # Filtrar dados com base na nova lista de seleção
-        dados_filtrados = []
-        for registro in self.dados_consolidados:
-            try:
-                data_registro = datetime.datetime.strptime(registro['data'], "%d/%m/%Y").date()
-                if data_inicio <= data_registro <= data_fim:
-                    if "Todos" in self.funcionarios_selecionados or registro['nome'] in self.funcionarios_selecionados:
-                        dados_filtrados.append(registro)
-            except (ValueError, TypeError):
-                continue
-
-        if not dados_filtrados:
-            self.txt_relatorio.insert("end", "Nenhum registro encontrado para os filtros selecionados.\n")
-            self.txt_relatorio.configure(state="disabled")
-            return
+        self.cancelar_relatorio = cancelar = threading.Event()
+        self.frames["Relatorios"].btn_gerar_relatorio.configure(text="Cancelar")
+        threading.Thread(target=self.tarefa_relatorio, args=(data_inicio, data_fim, nomes, nome_relatorio, cancelar), daemon=True).start()
 
-        # Agregar dados
-        registros_por_dia = defaultdict(lambda: defaultdict(list))
-        for registro in dados_filtrados:
-            registros_por_dia[registro['nome']][registro['data']].append(registro['hora'])
-
-        self.dados_relatorio = []
-        for nome, dias in registros_por_dia.items():
-            for data, horas in dias.items():
-                horas.sort()
-                entrada = horas[0]
-                saida = horas[-1] if len(horas) > 1 else "--:--"
-                self.dados_relatorio.append({
-                    "Nome": nome,
-                    "Data": data,
-                    "Entrada": entrada,
-                    "Saída": saida
-                })
-
-        # Ordenar relatório por data
-        self.dados_relatorio.sort(key=lambda x: datetime.datetime.strptime(x['Data'], "%d/%m/%Y"))
-
-        # Exibir no preview
+    def tarefa_relatorio(self, data_inicio, data_fim, nomes, nome_relatorio, cancelar):
+        resultado = {'acao': 'relatorio', 'cancelar': cancelar, 'nome': nome_relatorio, 'linhas': None, 'texto': None}
+        try:
+            dados_filtrados = self.motor.banco.consultar_colunas(data_inicio, data_fim, nomes, cancelar)
+            if dados_filtrados is not None and not cancelar.is_set():
+                linhas = agregar_relatorio(dados_filtrados, cancelar)
+                if linhas is not None and not cancelar.is_set():
+                    resultado['linhas'] = linhas
+                    resultado['texto'] = texto_preview_relatorio(linhas) if linhas else "Nenhum registro encontrado para os filtros selecionados.\n"
+        except Exception as e:
+            log_debug(f"Erro ao gerar relatório: {e}"); logging.error(traceback.format_exc())
+            resultado['texto'] = f"Erro ao gerar relatório: {e}\n"
+        self.queue.put(resultado)
+
+    def concluir_relatorio(self, task):
+        # Chamado pela fila na thread da interface; resultados de uma geração cancelada ou já substituída são descartados
+        if task['cancelar'] is not self.cancelar_relatorio: return
+        self.cancelar_relatorio = None
+        self.frames["Relatorios"].btn_gerar_relatorio.configure(text="Gerar Relatório")
+        self.txt_relatorio.configure(state="normal")
         self.txt_relatorio.delete("1.0", "end")
-        header = f"{'Nome':<20} {'Data':<12} {'Entrada':<10} {'Saída':<10}\n"
-        self.txt_relatorio.insert("end", header)
-        self.txt_relatorio.insert("end", "-" * 60 + "\n")
-
-        for linha in self.dados_relatorio:
-            self.txt_relatorio.insert("end", f"{linha['Nome']:<20} {linha['Data']:<12} {linha['Entrada']:<10} {linha['Saída']:<10}\n")
-
+        self.txt_relatorio.insert("end", task['texto'])
         self.txt_relatorio.configure(state="disabled")
+        if not task['linhas']: return
+
+        self.dados_relatorio = task['linhas']
         # Habilitar botões de exportação
         self.btn_export_csv.configure(state="normal")
         self.btn_export_excel.configure(state="normal")
         self.btn_export_pdf.configure(state="normal")
 
-        self.adicionar_relatorio_ao_historico()
-
-    def adicionar_relatorio_ao_historico(self):
-        nome_relatorio = self.combo_funcionarios.get()
-        if len(self.funcionarios_selecionados) > 1:
-            nome_relatorio = f"{len(self.funcionarios_selecionados)} funcionários"
+        self.adicionar_relatorio_ao_historico(task['nome'])
 
+    def adicionar_relatorio_ao_historico(self, nome_relatorio):
         novo_historico = {
             "nome": nome_relatorio,
             "timestamp": datetime.datetime.now(),
@@ -795,14 +954,7 @@ class AbaRelatorios(ctk.CTkFrame):
 
         self.txt_relatorio.configure(state="normal")
         self.txt_relatorio.delete("1.0", "end")
-
-        header = f"{'Nome':<20} {'Data':<12} {'Entrada':<10} {'Saída':<10}\n"
-        self.txt_relatorio.insert("end", header)
-        self.txt_relatorio.insert("end", "-" * 60 + "\n")
-
-        for linha in self.dados_relatorio:
-            self.txt_relatorio.insert("end", f"{linha['Nome']:<20} {linha['Data']:<12} {linha['Entrada']:<10} {linha['Saída']:<10}\n")
-
+        self.txt_relatorio.insert("end", texto_preview_relatorio(self.dados_relatorio))
         self.txt_relatorio.configure(state="disabled")
         self.btn_export_csv.configure(state="normal")
         self.btn_export_excel.configure(state="normal")
@@ -833,10 +985,7 @@ class AbaRelatorios(ctk.CTkFrame):
             return
 
         try:
-            with open(filepath, "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=self.dados_relatorio[0].keys())
-                writer.writeheader()
-                writer.writerows(self.dados_relatorio)
+            exportar_relatorio_csv(filepath, self.dados_relatorio)
             messagebox.showinfo("Sucesso", "Relatório exportado para CSV com sucesso!")
         except Exception as e:
             messagebox.showerror("Erro", f"Ocorreu um erro ao exportar para CSV: {e}")
@@ -850,80 +999,92 @@ class AbaRelatorios(ctk.CTkFrame):
             return
 
         try:
-            workbook = Workbook()
-            sheet = workbook.active
-
-            headers = list(self.dados_relatorio[0].keys())
-            sheet.append(headers)
-
-            for row in self.dados_relatorio:
-                sheet.append(list(row.values()))
-
-            workbook.save(filepath)
+            exportar_relatorio_excel(filepath, self.dados_relatorio)
             messagebox.showinfo("Sucesso", "Relatório exportado para Excel com sucesso!")
         except Exception as e:
             messagebox.showerror("Erro", f"Ocorreu um erro ao exportar para Excel: {e}")
 
     def carregar_lista_funcionarios(self, event=None):
-        for widget in self.scroll_func.winfo_children():
-            widget.destroy()
-
-        # 1. Filtrar
-        texto_filtro = self.filtro_nome.get().lower()
-        funcionarios_filtrados = [
-            f for f in self.dados_funcionarios
-            if f.get('status', 'ativo') == 'ativo' and texto_filtro in f['nome'].lower()
-        ]
+        self.id_filtro_agendado = None
 
-        # 2. Ordenar
+        # 1. Filtrar e 2. Ordenar (pelo índice pré-calculado)
         campo_ordem = self.filtro_ordem_campo.get()
         direcao_ordem = self.filtro_ordem_dir.get() == "Decrescente"
-
-        def get_sort_key(f):
-            if campo_ordem == "Data de Admissão":
-                try:
-                    return datetime.datetime.strptime(f.get("admissao", "01/01/1900"), '%d/%m/%Y')
-                except ValueError:
-                    return datetime.datetime.min
-            elif campo_ordem == "Salário":
-                try:
-                    return float(str(f.get("salario", "0")).replace(',', '.'))
-                except ValueError:
-                    return 0.0
-            return f['nome'].lower()
-
-        funcionarios_filtrados.sort(key=get_sort_key, reverse=direcao_ordem)
-
-        # 3. Exibir
-        if not funcionarios_filtrados:
-            ctk.CTkLabel(self.scroll_func, text="Nenhum funcionário encontrado com os filtros atuais.").pack(pady=20)
+        funcionarios_filtrados = self.indice_funcionarios.buscar(self.filtro_nome.get(), campo_ordem, direcao_ordem)
+        # Filtro ou ordenação nova volta ao primeiro lote (os cards além dele são destruídos na sincronização);
+        # recarregar com os mesmos critérios, após uma edição, mantém o que já foi rolado
+        criterio = (self.filtro_nome.get(), campo_ordem, direcao_ordem)
+        if criterio != self.criterio_lista: self.limite_cards = LOTE_CARDS; self.criterio_lista = criterio
+
+        # 3. Exibir (aplica só as diferenças em relação aos cards já criados)
+        self.funcionarios_visiveis = funcionarios_filtrados
+        self.sincronizar_cards()
+
+    def agendar_filtro(self, event=None):
+        # Debounce: só refiltra depois que o usuário para de digitar
+        if getattr(self, 'id_filtro_agendado', None): self.after_cancel(self.id_filtro_agendado)
+        self.id_filtro_agendado = self.after(ATRASO_FILTRO_MS, self.carregar_lista_funcionarios)
+
+    def renderizar_mais_cards(self):
+        if self.limite_cards < len(self.funcionarios_visiveis):
+            self.limite_cards += LOTE_CARDS
+            self.sincronizar_cards()
+
+    def sincronizar_cards(self):
+        lista = self.funcionarios_visiveis[:self.limite_cards]
+
+        if not lista:
+            for ent in self.cards_funcionarios.values(): ent['card'].destroy()
+            self.cards_funcionarios.clear(); self.ordem_cards = []
+            if not (self.lbl_lista_vazia and self.lbl_lista_vazia.winfo_exists()):
+                self.lbl_lista_vazia = ctk.CTkLabel(self.scroll_func, text="Nenhum funcionário encontrado com os filtros atuais.")
+                self.lbl_lista_vazia.pack(pady=20)
             return
-
-        for funcionario_data in funcionarios_filtrados:
-            self.criar_grupo_funcionario(funcionario_data)
+        if self.lbl_lista_vazia and self.lbl_lista_vazia.winfo_exists():
+            self.lbl_lista_vazia.destroy()
+        self.lbl_lista_vazia = None
+
+        # Remove os cards que saíram da lista
+        ids = {f['id'] for f in lista}
+        for id_func in [i for i in self.cards_funcionarios if i not in ids]:
+            self.cards_funcionarios.pop(id_func)['card'].destroy()
+
+        # Cria os novos e recria só os que mudaram (nome, fotos ou tema)
+        recriados = False
+        for f in lista:
+            assinatura = (f['nome'], tuple(f['fotos']), self.current_theme)
+            ent = self.cards_funcionarios.get(f['id'])
+            if ent and ent['assinatura'] == assinatura: continue
+            if ent: ent['card'].destroy()
+            self.cards_funcionarios[f['id']] = {'card': self.criar_grupo_funcionario(f), 'assinatura': assinatura}
+            recriados = True
+
+        # Reempacota apenas se a ordem mudou ou algum card foi (re)criado
+        ordem = [f['id'] for f in lista]
+        if recriados or ordem != self.ordem_cards:
+            for id_func in ordem: self.cards_funcionarios[id_func]['card'].pack_forget()
+            for id_func in ordem: self.cards_funcionarios[id_func]['card'].pack(fill="x", padx=5, pady=5)
+            self.ordem_cards = ordem
 
     def criar_grupo_funcionario(self, funcionario_data):
         nome = funcionario_data['nome']
         fotos = funcionario_data['fotos']
 
         card = ctk.CTkFrame(self.scroll_func, fg_color=COLOR_CARD, corner_radius=10, border_color=COLOR_BORDER, border_width=1)
-        card.pack(fill="x", padx=5, pady=5)
 
         header = ctk.CTkFrame(card, fg_color="transparent", height=50)
         header.pack(fill="x", padx=10, pady=5)
 
-        try:
-            path = os.path.join(self.pasta_funcionarios, fotos[0]) if fotos else ""
-            if path and os.path.exists(path):
-                pil = Image.open(path)
-                pil.thumbnail((40, 40))
+        # Placeholder até a miniatura ficar pronta (gerada fora da thread do Tk)
+        lbl_img = ctk.CTkLabel(header, text="👤", font=("Arial", 20))
+        lbl_img.pack(side="left", padx=10)
+        path = os.path.join(self.pasta_funcionarios, fotos[0]) if fotos else ""
+        if path:
+            def mostrar_miniatura(pil, lbl=lbl_img):
+                if pil is None or not lbl.winfo_exists(): return
                 tk_img = ctk.CTkImage(light_image=pil, dark_image=pil, size=(40, 40))
-                lbl_img = ctk.CTkLabel(header, image=tk_img, text="")
-                lbl_img.pack(side="left")
-            else:
-                ctk.CTkLabel(header, text="👤", font=("Arial", 20)).pack(side="left", padx=10)
-        except:
-            ctk.CTkLabel(header, text="👤", font=("Arial", 20)).pack(side="left", padx=10)
+                lbl.configure(image=tk_img, text=""); lbl.pack_configure(padx=0)
+            self.miniaturas.solicitar(path, (40, 40), mostrar_miniatura)
 
         ctk.CTkLabel(header, text=nome, font=("Arial", 14, "bold"), text_color="white").pack(side="left", padx=15)
         ctk.CTkLabel(header, text=f"{len(fotos)} variações", font=("Arial", 11), text_color=COLOR_TEXT_DIM).pack(side="left", padx=5)
@@ -931,6 +1092,21 @@ class AbaRelatorios(ctk.CTkFrame):
         btn_expand = ctk.CTkButton(header, text="▼", width=30, fg_color="transparent", text_color=COLOR_INFO, hover_color="#1e293b")
         btn_expand.pack(side="right")
 
+        # O corpo (ações + uma linha por foto) só é criado na primeira vez que o card é expandido
+        corpo = []
+        def toggle():
+            if not corpo: corpo.append(self.criar_corpo_funcionario(card, funcionario_data))
+            body = corpo[0]
+            if body.winfo_ismapped():
+                body.pack_forget(); btn_expand.configure(text="▼")
+            else:
+                body.pack(fill="x", padx=10, pady=(0, 10)); btn_expand.configure(text="▲")
+
+        btn_expand.configure(command=toggle)
+        return card
+
+    def criar_corpo_funcionario(self, card, funcionario_data):
+        fotos = funcionario_data['fotos']
         body = ctk.CTkFrame(card, fg_color="#0b1120")
 
         # Ações do funcionário
@@ -955,13 +1131,7 @@ class AbaRelatorios(ctk.CTkFrame):
                                     command=lambda file=f: self.delete_foto_funcionario(funcionario_data['id'], file))
             btn_del_foto.pack(side="right")
 
-        def toggle():
-            if body.winfo_ismapped():
-                body.pack_forget(); btn_expand.configure(text="▼")
-            else:
-                body.pack(fill="x", padx=10, pady=(0, 10)); btn_expand.configure(text="▲")
-
-        btn_expand.configure(command=toggle)
+        return body
 
     def add_funcionario(self):
         self.open_funcionario_window()
@@ -985,15 +1155,17 @@ class AbaRelatorios(ctk.CTkFrame):
             novo_nome_foto = f"{nome_limpo}_{int(time.time())}.jpg"
 
             # Copia a nova foto
-            shutil.copy(path, os.path.join(self.pasta_funcionarios, novo_nome_foto))
+            destino = os.path.join(self.pasta_funcionarios, novo_nome_foto)
+            shutil.copy(path, destino)
+            self.motor.cache_encodings.invalidar(destino)
 
             # Atualiza a lista de fotos do funcionário
             for func in self.dados_funcionarios:
                 if func['id'] == funcionario['id']:
                     func['fotos'].append(novo_nome_foto)
+                    self.salvar_funcionario(func)
                     break
 
-            self.salvar_dados_funcionarios()
             self.carregar_lista_funcionarios()
             messagebox.showinfo("Sucesso", "Nova variação de foto adicionada com sucesso!")
 
@@ -1001,7 +1173,7 @@ class AbaRelatorios(ctk.CTkFrame):
             messagebox.showerror("Erro", f"Ocorreu um erro ao adicionar a variação: {e}")
 
     def excluir_funcionario(self, funcionario):
-        if not messagebox.askyesno("Confirmar Exclusão", f"Tem certeza que deseja excluir o funcionário '{funcionario['nome']}'?\n\nIsso irá apenas desativá-lo da interface, mantendo seus dados no histórico. A ação pode ser revertida manualmente no arquivo 'funcionarios.json'."):
+        if not messagebox.askyesno("Confirmar Exclusão", f"Tem certeza que deseja excluir o funcionário '{funcionario['nome']}'?\n\nIsso irá apenas desativá-lo da interface, mantendo seus dados no histórico. A ação pode ser revertida manualmente no banco 'ponto.db'."):
             return
 
         try:
@@ -1009,9 +1181,9 @@ class AbaRelatorios(ctk.CTkFrame):
             for func in self.dados_funcionarios:
                 if func['id'] == funcionario['id']:
                     func['status'] = 'inativo'
+                    self.salvar_funcionario(func)
                     break
 
-            self.salvar_dados_funcionarios()
             self.carregar_lista_funcionarios()
             messagebox.showinfo("Sucesso", f"Funcionário '{funcionario['nome']}' desativado.")
         except Exception as e:
@@ -1027,15 +1199,17 @@ class AbaRelatorios(ctk.CTkFrame):
                 if func['id'] == funcionario_id:
                     if filename in func['fotos']:
                         func['fotos'].remove(filename)
+                        # Salva a alteração no banco (só este funcionário)
+                        self.salvar_funcionario(func)
                         break
 
-            # Salva a alteração no JSON
-            self.salvar_dados_funcionarios()
 
             # Remove o arquivo físico
             filepath = os.path.join(self.pasta_funcionarios, filename)
             if os.path.exists(filepath):
                 os.remove(filepath)
+            self.motor.cache_encodings.invalidar(filepath)
+            self.motor.cache_encodings.salvar()
 
             # Recarrega a interface
             self.carregar_lista_funcionarios()
@@ -1060,7 +1234,7 @@ class AbaRelatorios(ctk.CTkFrame):
             try:
                 with open(ARQUIVO_CONFIG, 'r') as f: return json.load(f)
             except: pass
-        return {'tolerancia': 0.45, 'last_dir': '/'}
+        return {'tolerancia': 0.45, 'last_dir': '/', 'processos': 1, 'extrair_zip': False}
 
     def save_config(self):
         try:
@@ -1069,29 +1243,55 @@ class AbaRelatorios(ctk.CTkFrame):
         except: pass
 
     def carregar_dados_funcionarios(self):
-        if not os.path.exists(ARQUIVO_FUNCIONARIOS):
-            self.migrar_dados_antigos()
+        # Migração única para o banco: do funcionarios.json, ou das fotos soltas se nem ele existir
+        if not self.motor.banco.obter_meta('funcionarios_migrados'):
+            migrado = self.migrar_dados_json() if os.path.exists(ARQUIVO_FUNCIONARIOS) else self.migrar_dados_antigos()
+            # Se a gravação falhou, a migração é tentada de novo na próxima abertura
+            if migrado: self.motor.banco.definir_meta('funcionarios_migrados', datetime.datetime.now().isoformat())
 
         try:
-            with open(ARQUIVO_FUNCIONARIOS, 'r', encoding='utf-8') as f:
-                self.dados_funcionarios = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            self.dados_funcionarios = self.motor.banco.carregar_funcionarios()
+        except Exception as e:
+            log_debug(f"Erro ao carregar funcionários do banco: {e}")
             self.dados_funcionarios = []
+        self.indice_funcionarios.atualizar(self.dados_funcionarios)
+
+    def salvar_funcionario(self, funcionario):
+        # Uma edição grava só a linha e as fotos desse funcionário; a lista inteira fica para a migração
+        self.indice_funcionarios.atualizar(self.dados_funcionarios)
+        try:
+            self.motor.banco.salvar_funcionario(funcionario)
+            return True
+        except Exception as e:
+            messagebox.showerror("Erro ao Salvar", f"Não foi possível salvar os dados do funcionário: {e}")
+            return False
 
     def salvar_dados_funcionarios(self):
+        self.indice_funcionarios.atualizar(self.dados_funcionarios)
         try:
-            with open(ARQUIVO_FUNCIONARIOS, 'w', encoding='utf-8') as f:
-                json.dump(self.dados_funcionarios, f, indent=4)
+            self.motor.banco.salvar_funcionarios(self.dados_funcionarios)
+            return True
         except Exception as e:
             messagebox.showerror("Erro ao Salvar", f"Não foi possível salvar os dados dos funcionários: {e}")
+            return False
+
+    def migrar_dados_json(self):
+        log_debug(f"Migrando '{ARQUIVO_FUNCIONARIOS}' para o banco de dados...")
+        try:
+            with open(ARQUIVO_FUNCIONARIOS, 'r', encoding='utf-8') as f:
+                self.dados_funcionarios = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.dados_funcionarios = []
+        if not self.salvar_dados_funcionarios(): return False
+        log_debug(f"Migração concluída. {len(self.dados_funcionarios)} funcionários salvos no banco (o JSON original foi mantido como backup).")
+        return True
 
     def migrar_dados_antigos(self):
-        log_debug("Arquivo 'funcionarios.json' não encontrado. Tentando migrar do sistema antigo...")
+        log_debug("Nenhum cadastro encontrado. Tentando migrar do sistema antigo...")
         funcionarios_migrados = []
         if not os.path.exists(self.pasta_funcionarios):
             self.dados_funcionarios = []
-            self.salvar_dados_funcionarios()
-            return
+            return self.salvar_dados_funcionarios()
 
         arquivos = [f for f in os.listdir(self.pasta_funcionarios) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
         funcionarios_dict = defaultdict(list)
@@ -1118,8 +1318,9 @@ class AbaRelatorios(ctk.CTkFrame):
             })
 
         self.dados_funcionarios = funcionarios_migrados
-        self.salvar_dados_funcionarios()
-        log_debug(f"Migração concluída. {len(self.dados_funcionarios)} funcionários salvos em 'funcionarios.json'.")
+        if not self.salvar_dados_funcionarios(): return False
+        log_debug(f"Migração concluída. {len(self.dados_funcionarios)} funcionários salvos no banco.")
+        return True
 
     # --- UI HELPERS ---
     def update_slider_label(self, value):
@@ -1129,8 +1330,19 @@ class AbaRelatorios(ctk.CTkFrame):
         ctk.CTkLabel(parent, text=text, font=("Arial", 11, "bold"), text_color=COLOR_TEXT_DIM).pack(anchor="w", padx=20, pady=(0, 5))
 
     def log_tela(self, msg):
+        self.log_tela_lote([msg])
+
+    def log_tela_lote(self, mensagens):
+        # Um insert por lote; a caixa guarda só as últimas LIMITE_LINHAS_LOG linhas (buffer circular)
+        if not mensagens: return
+        for m in mensagens: logging.info(m)
         self.txt_log.configure(state="normal")
-        self.txt_log.insert("end", f"> {msg}\n"); self.txt_log.see("end")
+        self.txt_log.insert("end", "".join(f"> {m}\n" for m in mensagens))
+        self.linhas_log = getattr(self, 'linhas_log', 0) + sum(1 + m.count("\n") for m in mensagens)
+        if self.linhas_log > LIMITE_LINHAS_LOG:
+            excesso = self.linhas_log - LIMITE_LINHAS_LOG
+            self.txt_log.delete("1.0", f"{excesso + 1}.0"); self.linhas_log = LIMITE_LINHAS_LOG
+        self.txt_log.see("end")
         self.txt_log.configure(state="disabled")
 
     def selecionar_zip(self):
@@ -1143,32 +1355,47 @@ class AbaRelatorios(ctk.CTkFrame):
             self.save_config()
 
     def solicitar_parada(self):
-        if messagebox.askyesno("Parar", "Interromper?"): self.parar_execucao = True
+        if messagebox.askyesno("Parar", "Interromper?"): self.motor.parar_execucao = True
 
     def restaurar_botoes(self):
         self.btn_iniciar.configure(state="normal"); self.btn_parar.configure(state="disabled")
         self.progress_bar.set(0); self.lbl_status_txt.configure(text="Pronto.")
 
     def verificar_fila(self):
+        # A cada tick: logs acumulados viram um único insert e só o último progresso é desenhado
+        logs = []; progresso = None
         try:
             while True:
                 task = self.queue.get_nowait()
                 acao = task.get('acao')
-                if acao == 'log': self.log_tela(task['texto'])
-                elif acao == 'progresso':
-                    self.progress_bar.set(task['valor'] / task['max'])
-                    self.lbl_status_txt.configure(text=task['status'])
-                    self.lbl_estimativa.configure(text=task['estimativa'])
-                elif acao == 'corrigir': self.abrir_corretor_visual(task['lista'])
-                elif acao == 'salvar_final': threading.Thread(target=self.salvar_dados, args=(self.dados_temporarios,)).start()
-                elif acao == 'msg_fim':
-                    messagebox.showinfo("Fim", task['texto'])
-                    self.btn_pdf.configure(state="normal", fg_color=COLOR_CARD)
-                    self.restaurar_botoes()
-                elif acao == 'msg_erro': messagebox.showerror("ERRO", task['texto']); self.restaurar_botoes()
+                if acao == 'log': logs.append(task['texto'])
+                elif acao == 'progresso': progresso = task
+                else:
+                    # Antes de qualquer outra ação (que pode abrir um diálogo ou restaurar os botões), a tela mostra
+                    # o que veio antes dela; assim um progresso antigo nunca sobrescreve o estado final
+                    self.log_tela_lote(logs); logs = []
+                    if progresso: self.aplicar_progresso(progresso); progresso = None
+                    if acao == 'miniatura': task['callback'](task['imagem'])
+                    elif acao == 'relatorio': self.concluir_relatorio(task)
+                    elif acao == 'metricas': self.lbl_metricas.configure(text="\n".join(task['linhas']))
+                    elif acao == 'corrigir': self.abrir_corretor_visual(task['lista'])
+                    elif acao == 'salvar_final': threading.Thread(target=self.salvar_dados, args=(self.dados_temporarios,)).start()
+                    elif acao == 'msg_fim':
+                        messagebox.showinfo("Fim", task['texto'])
+                        self.btn_pdf.configure(state="normal", fg_color=COLOR_CARD)
+                        self.restaurar_botoes()
+                    elif acao == 'msg_erro': messagebox.showerror("ERRO", task['texto']); self.restaurar_botoes()
                 self.queue.task_done()
         except queue.Empty: pass
-        finally: self.after(100, self.verificar_fila)
+        finally:
+            self.log_tela_lote(logs)
+            if progresso: self.aplicar_progresso(progresso)
+            self.after(INTERVALO_FILA_MS, self.verificar_fila)
+
+    def aplicar_progresso(self, task):
+        self.progress_bar.set(task['valor'] / task['max'])
+        self.lbl_status_txt.configure(text=task['status'])
+        self.lbl_estimativa.configure(text=task['estimativa'])
 
     def abrir_corretor_visual(self, lista):
         janela = ctk.CTkToplevel(self); janela.title("Confirmação Manual"); janela.geometry("1000x750"); janela.attributes('-topmost', True); janela.transient(self); janela.grab_set()
@@ -1180,22 +1407,26 @@ class AbaRelatorios(ctk.CTkFrame):
         frame_decisao = ctk.CTkFrame(janela, fg_color=COLOR_CARD, corner_radius=0); frame_decisao.grid(row=0, column=1, sticky="nsew")
         ctk.CTkLabel(frame_decisao, text="QUEM É?", font=("Arial", 20, "bold"), text_color=COLOR_ACCENT).pack(pady=(40, 20))
         scroll_btns = ctk.CTkScrollableFrame(frame_decisao, fg_color="transparent"); scroll_btns.pack(fill="both", expand=True, padx=20)
-        idx = [0]
-        def finalizar(): janela.destroy(); self.queue.put({'acao': 'salvar_final'})
+        idx = [0]; inicio = time.perf_counter()
+        def finalizar():
+            self.motor.metricas.adicionar_tempo('correcao_manual', time.perf_counter() - inicio)
+            self.motor.metricas.contar('correcoes_manuais', idx[0])
+            janela.destroy(); self.queue.put({'acao': 'salvar_final'})
         def show():
             if idx[0] >= len(lista): finalizar(); return
             item = lista[idx[0]]
             lbl_foto.configure(image=None, text="Carregando..."); janela.update()
-            lbl_info.configure(text=f"Foto {idx[0]+1}/{len(lista)}\n{item['data']} às {item['hora']}")
+            copias = f" (+{len(item['copias'])} cópias)" if item.get('copias') else ""
+            lbl_info.configure(text=f"Foto {idx[0]+1}/{len(lista)}{copias}\n{item['data']} às {item['hora']}")
             try:
                 p = item['caminho_completo']
-                if os.path.exists(p):
-                    pil = Image.open(p); ratio = min(550/pil.width, 550/pil.height); tk_i = ctk.CTkImage(light_image=pil, dark_image=pil, size=(int(pil.width*ratio), int(pil.height*ratio)))
+                if isinstance(p, MidiaZip) or os.path.exists(p):
+                    pil = Image.open(abrir_midia(p)); ratio = min(550/pil.width, 550/pil.height); tk_i = ctk.CTkImage(light_image=pil, dark_image=pil, size=(int(pil.width*ratio), int(pil.height*ratio)))
                     lbl_foto.configure(image=tk_i, text=""); lbl_foto.image = tk_i
                 else: lbl_foto.configure(text="Arquivo não encontrado", image=None)
             except Exception as e: lbl_foto.configure(text=f"Erro: {e}", image=None)
         def set_n(n):
-            lista[idx[0]]['nome'] = n
+            for d in [lista[idx[0]]] + lista[idx[0]].get('copias', []): d['nome'] = n; d['manual'] = True
             if n != "Desconhecido": threading.Thread(target=self.aprender_rosto, args=(lista[idx[0]]['caminho_completo'], n)).start()
             idx[0] += 1; show()
         nomes = sorted(list(set(self.conhecidos_nom)))
@@ -1208,7 +1439,7 @@ class AbaRelatorios(ctk.CTkFrame):
         if not self.caminho_zip: messagebox.showwarning("Aviso", "Selecione ZIP!"); return
         if not os.path.exists(self.pasta_funcionarios): os.makedirs(self.pasta_funcionarios)
         self.save_config()
-        self.parar_execucao = False
+        self.motor.parar_execucao = False
         self.btn_iniciar.configure(state="disabled"); self.btn_parar.configure(state="normal"); self.btn_pdf.configure(state="disabled")
         threading.Thread(target=self.wrapper_processar).start()
 
@@ -1216,249 +1447,33 @@ class AbaRelatorios(ctk.CTkFrame):
         try: self.processar()
         except Exception as e: log_debug(f"ERRO: {e}"); logging.error(traceback.format_exc()); self.queue.put({'acao': 'msg_erro', 'texto': f"Erro: {e}"})
         finally:
-            if self.temp_dir and os.path.exists(self.temp_dir): pass
-
-    def preparing_arquivos(self):
-        self.queue.put({'acao': 'log', 'texto': "📦 Extraindo ZIP..."})
-        self.temp_dir = tempfile.mkdtemp()
-        with zipfile.ZipFile(self.caminho_zip, 'r') as zip_ref: zip_ref.extractall(self.temp_dir)
-        caminho_txt = None; media_files = []
-        for root, dirs, files in os.walk(self.temp_dir):
-            for file in files:
-                if file.endswith(".txt") and "chat" in file.lower(): caminho_txt = os.path.join(root, file)
-                elif file.endswith(".txt") and not caminho_txt: caminho_txt = os.path.join(root, file)
-                if "-WA" in file or file.lower().endswith(('.jpg','.opus','.mp4','.webp')): media_files.append(os.path.join(root, file))
-        if not caminho_txt: raise Exception("ZIP inválido.")
-        media_files.sort()
-        return self.temp_dir, caminho_txt, media_files
-
-    def obter_horarios_validos(self, caminho_txt, d_ini, d_fim):
-        horarios = []
-        padrao = re.compile(r'^(\d{2}/\d{2}/\d{4})\s(\d{2}:\d{2})')
-        try:
-            with open(caminho_txt, 'r', encoding='utf-8') as f:
-                for linha in f:
-                    if "<Mídia oculta>" in linha or "(arquivo anexado)" in linha or "(anexado)" in linha or ".jpg" in linha or ".opus" in linha:
-                        m = padrao.search(linha)
-                        if m:
-                            d, h = m.groups()
-                            try:
-                                dt = datetime.datetime.strptime(d, "%d/%m/%Y").date()
-                                if d_ini <= dt <= d_fim: horarios.append({'data': d, 'hora': h})
-                            except: pass
-            return horarios
-        except: raise Exception("Erro TXT")
+            if self.motor.temp_dir and os.path.exists(self.motor.temp_dir): pass
 
     def aprender_rosto(self, origem, nome):
-        try:
-            ts = int(time.time()); dest = os.path.join(self.pasta_funcionarios, f"{nome}_auto_{ts}.jpg")
-            shutil.copy(origem, dest); self.queue.put({'acao': 'log', 'texto': f"🧠 Aprendido: {nome}"})
-        except: pass
+        self.motor.aprender_rosto(origem, nome)
 
     def salvar_dados(self, dados):
-        if not dados: self.queue.put({'acao': 'msg_fim', 'texto': 'Nada para salvar.'}); return
-        self.dados_consolidados = dados
-        self.queue.put({'acao': 'log', 'texto': f"📤 Salvando {len(dados)} registros..."})
-        lista = [[d['nome'], d['data'], d['hora'], os.path.basename(d['caminho_completo'])] for d in dados]
-        try:
-            scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-            creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-            sheet = gspread.authorize(creds).open(NOME_PLANILHA_GOOGLE).sheet1
-            sheet.append_rows(lista)
-            self.queue.put({'acao': 'msg_fim', 'texto': "Processo Finalizado com Sucesso!"})
-        except: self.queue.put({'acao': 'msg_fim', 'texto': "Erro Google Sheets (PDF Disponível)."})
-        finally:
-            if self.temp_dir and os.path.exists(self.temp_dir):
-                try: shutil.rmtree(self.temp_dir); log_debug("Temp limpo.")
-                except: pass
+        if dados: self.dados_consolidados = dados
+        self.motor.salvar_dados(dados)
 
     def processar(self):
-        try: pasta_temp, caminho_txt, todos_arquivos = self.preparing_arquivos()
-        except Exception as e: self.queue.put({'acao': 'msg_erro', 'texto': str(e)}); return
         d_ini = self.cal_inicio.get_date(); d_fim = self.cal_fim.get_date()
-        self.queue.put({'acao': 'log', 'texto': f"--- Iniciando {d_ini} a {d_fim} ---"})
-        lista_horarios = self.obter_horarios_validos(caminho_txt, d_ini, d_fim)
-        limite = min(len(lista_horarios), len(todos_arquivos))
-        if limite == 0: self.queue.put({'acao': 'msg_fim', 'texto': "Sem correspondência."}); return
-        fila_para_reconhecer = []; pular = 0
-        for i in range(limite):
-            arq = todos_arquivos[i]; hr = lista_horarios[i]
-            if arq.lower().endswith(('.jpg', '.jpeg', '.png')): fila_para_reconhecer.append({'caminho': arq, 'data': hr['data'], 'hora': hr['hora']})
-            else: pular += 1
-        self.queue.put({'acao': 'log', 'texto': f"ℹ️ Sincronia: {pular} mídias não-foto ignoradas."})
-        self.conhecidos_enc = []; self.conhecidos_nom = []
-        self.queue.put({'acao': 'log', 'texto': "🧠 Carregando Faces..."})
-        if os.path.exists(self.pasta_funcionarios):
-            for f in os.listdir(self.pasta_funcionarios):
-                if f.lower().endswith(('jpg', 'png')):
-                    try:
-                        im = face_recognition.load_image_file(os.path.join(self.pasta_funcionarios, f))
-                        enc = face_recognition.face_encodings(im)
-                        if not enc:
-                            locs = face_recognition.face_locations(im, number_of_times_to_upsample=2, model="hog")
-                            enc = face_recognition.face_encodings(im, known_face_locations=locs)
-                        if enc: self.conhecidos_enc.append(enc[0]); self.conhecidos_nom.append(os.path.splitext(f)[0].split('_')[0].capitalize())
-                    except: pass
-        self.dados_temporarios = []; total = len(fila_para_reconhecer)
-        self.queue.put({'acao': 'config_max', 'valor': total})
-        self.queue.put({'acao': 'log', 'texto': f"🚀 Analisando {total} fotos..."})
-        tol = self.slider.get(); start = time.time()
-        for idx, item in enumerate(fila_para_reconhecer):
-            if self.parar_execucao: break
-            elapsed = time.time() - start
-            est = f"Restam {divmod(int((elapsed/(idx+1))*(total-(idx+1))), 60)[0]}m"
-            self.queue.put({'acao': 'progresso', 'valor': idx+1, 'max': total, 'estimativa': est, 'status': f"Processando {idx+1}/{total}"})
-            try:
-                p = item['caminho']; im = face_recognition.load_image_file(p)
-                small = np.ascontiguousarray(im[0::2, 0::2])
-                encs = face_recognition.face_encodings(small)
-                if not encs: encs = face_recognition.face_encodings(im)
-                if not encs:
-                    locs = face_recognition.face_locations(im, number_of_times_to_upsample=2, model="hog")
-                    encs = face_recognition.face_encodings(im, known_face_locations=locs)
-                nomes = []
-                if encs:
-                    for e in encs:
-                        mat = face_recognition.compare_faces(self.conhecidos_enc, e, tolerance=tol)
-                        if True in mat: nomes.append(self.conhecidos_nom[mat.index(True)])
-                        else: nomes.append("Desconhecido")
-                else: nomes.append("Desconhecido")
-                for n in nomes:
-                    self.dados_temporarios.append({'nome': n, 'data': item['data'], 'hora': item['hora'], 'caminho_completo': p, 'arquivo_origem': os.path.basename(p)})
-                    self.queue.put({'acao': 'log', 'texto': f"✅ {n}"})
-            except: self.queue.put({'acao': 'log', 'texto': f"❌ Erro foto"})
-        desconhecidos = [d for d in self.dados_temporarios if d['nome'] == "Desconhecido"]
-        if desconhecidos and not self.parar_execucao: self.queue.put({'acao': 'corrigir', 'lista': desconhecidos})
+        self.motor.caminho_zip = self.caminho_zip
+        self.dados_temporarios = self.motor.processar(d_ini, d_fim, self.slider.get())
+        if self.dados_temporarios is None: return
+        self.conhecidos_nom = self.motor.conhecidos_nom
+        # Cada rosto desconhecido aparece uma vez só no corretor, mesmo com cópias da foto; a escolha vale
+        # para o mesmo rosto (mesmo índice na foto) em todas as cópias
+        grupos = OrderedDict()
+        for d in self.dados_temporarios:
+            if d['nome'] == "Desconhecido": grupos.setdefault((d['grupo'], d.get('rosto')) if d.get('grupo') is not None else id(d), []).append(d)
+        desconhecidos = []
+        for g in grupos.values(): g[0]['copias'] = g[1:]; desconhecidos.append(g[0])
+        if desconhecidos and not self.motor.parar_execucao: self.queue.put({'acao': 'corrigir', 'lista': desconhecidos})
         else: self.queue.put({'acao': 'salvar_final'})
 
     def gerar_pdf(self, filepath, data):
-        try:
-            c = canvas.Canvas(filepath, pagesize=A4)
-            w, h = A4
-            resumo_global = {}
-            meta_diaria = timedelta(hours=7, minutes=30)
-
-            if not data:
-                c.drawString(50, h - 50, "Nenhum dado para gerar o relatório.")
-                c.save()
-                return
-
-            is_report_data = 'Entrada' in data[0]
-
-            if not is_report_data:
-                # This is consolidated data
-                for d in data:
-                    nome = d['nome']
-                    if nome not in resumo_global:
-                        resumo_global[nome] = {'dias': {}, 'saldo': timedelta(0)}
-                    if d['data'] not in resumo_global[nome]['dias']:
-                        resumo_global[nome]['dias'][d['data']] = []
-                    resumo_global[nome]['dias'][d['data']].append(d['hora'])
-            else:
-                # This is report data
-                for d in data:
-                    nome = d['Nome']
-                    if nome not in resumo_global:
-                        resumo_global[nome] = {'dias': {}, 'saldo': timedelta(0)}
-                    if d['Data'] not in resumo_global[nome]['dias']:
-                        resumo_global[nome]['dias'][d['Data']] = []
-                    resumo_global[nome]['dias'][d['Data']].append(d['Entrada'])
-                    resumo_global[nome]['dias'][d['Data']].append(d['Saída'])
-
-            for nome, dados in resumo_global.items():
-                for dt, horas in dados['dias'].items():
-                    horas.sort()
-                    if len(horas) >= 2:
-                        ent_str = horas[0]
-                        sai_str = horas[-1]
-                        if ent_str and sai_str and ent_str != '--:--' and sai_str != '--:--':
-                            ent = datetime.datetime.strptime(ent_str, "%H:%M")
-                            sai = datetime.datetime.strptime(sai_str, "%H:%M")
-                            if ent != sai:
-                                trabalhado = (sai - ent) - timedelta(hours=1)
-                                dados['saldo'] += (trabalhado - meta_diaria)
-
-            y = h - 50
-            c.setFont("Helvetica-Bold", 18)
-            c.drawString(50, y, "Relatório Executivo de Ponto")
-            y -= 40
-            c.setFillColor(colors.black)
-            c.rect(50, y, 495, 25, fill=True, stroke=False)
-            c.setFillColor(colors.white)
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(60, y + 8, "FUNCIONÁRIO")
-            c.drawString(400, y + 8, "SALDO TOTAL")
-            y -= 30
-
-            def fmt_delta(td):
-                s = int(td.total_seconds())
-                sign = "+" if s >= 0 else "-"
-                s = abs(s)
-                return f"{sign}{s//3600:02d}:{(s%3600)//60:02d}"
-
-            for nome in sorted(resumo_global.keys()):
-                saldo = resumo_global[nome]['saldo']
-                cor = colors.green if saldo.total_seconds() >= 0 else colors.red
-                c.setFillColor(colors.black)
-                c.setFont("Helvetica", 11)
-                c.drawString(60, y, nome)
-                c.setFillColor(cor)
-                c.setFont("Helvetica-Bold", 11)
-                c.drawString(400, y, fmt_delta(saldo))
-                c.setStrokeColor(colors.lightgrey)
-                c.line(50, y - 5, 545, y - 5)
-                y -= 25
-
-            c.showPage()
-            y = h - 50
-
-            for nome in sorted(resumo_global.keys()):
-                if y < 150:
-                    c.showPage()
-                    y = h - 50
-                c.setFillColor(colors.darkblue)
-                c.setFont("Helvetica-Bold", 14)
-                c.drawString(50, y, f"Extrato: {nome}")
-                y -= 25
-                c.setFillColor(colors.lightgrey)
-                c.rect(50, y, 495, 15, fill=True, stroke=False)
-                c.setFillColor(colors.black)
-                c.setFont("Helvetica-Bold", 9)
-                c.drawString(55, y + 4, "DATA")
-                c.drawString(130, y + 4, "ENTRADA")
-                c.drawString(200, y + 4, "SAÍDA")
-                c.drawString(270, y + 4, "STATUS")
-                y -= 20
-                dias = resumo_global[nome]['dias']
-
-                datas_ordenadas = sorted(dias.keys(), key=lambda x: datetime.datetime.strptime(x, "%d/%m/%Y"))
-
-                for dt in datas_ordenadas:
-                    horas = dias[dt]
-                    horas.sort()
-                    ent = horas[0]
-                    sai = horas[-1]
-                    status = "OK"
-                    cor_st = colors.black
-                    if ent == sai:
-                        status = "Ponto Incompleto"
-                        cor_st = colors.orange
-                        sai = "--:--"
-                    c.setFillColor(colors.black)
-                    c.setFont("Helvetica", 10)
-                    c.drawString(55, y, dt)
-                    c.drawString(130, y, ent)
-                    c.drawString(200, y, sai)
-                    c.setFillColor(cor_st)
-                    c.drawString(270, y, status)
-                    y -= 15
-                    if y < 50:
-                        c.showPage()
-                        y = h - 50
-                y -= 30
-            c.save()
-        except Exception as e:
-            raise e
+        self.motor.gerar_pdf(filepath, data)
 
     def gerar_pdf_acao_wrapper(self):
         if not self.dados_consolidados:
@@ -1556,6 +1571,9 @@ class AbaRelatorios(ctk.CTkFrame):
         aba_proc.frame_right.configure(fg_color=bg_color)
         aba_proc.card_status.configure(fg_color=card_color, border_color=border_color)
         aba_proc.lbl_status_title.configure(text_color=text_dim_color)
+        aba_proc.card_metricas.configure(fg_color=card_color, border_color=border_color)
+        aba_proc.lbl_metricas_title.configure(text_color=text_dim_color)
+        self.lbl_metricas.configure(text_color=text_main_color)
         self.progress_bar.configure(progress_color=accent_color)
         self.lbl_status_txt.configure(text_color=accent_color)
         self.lbl_estimativa.configure(text_color=text_dim_color)
@@ -1594,5 +1612,8 @@ class AbaRelatorios(ctk.CTkFrame):
         self.atualizar_visualizacao_historico() # Recarrega para aplicar tema nos cards
 
 if __name__ == "__main__":
+    # Só no processo principal: no Windows os processos de reconhecimento reimportam este módulo (spawn)
+    # e um basicConfig com filemode='w' ali truncaria o log no meio da execução
+    logging.basicConfig(filename='log_debug.txt', level=logging.DEBUG, format='%(asctime)s - %(message)s', filemode='w')
     app = AppPonto()
     app.mainloop()
\ No newline at end of file